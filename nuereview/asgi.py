@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nuereview.settings')
+# Serve the async read views
+os.environ.setdefault('NUEREVIEW_URLCONF', 'nuereview.async_urls')
 
 application = get_asgi_application()
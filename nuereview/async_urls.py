@@ -0,0 +1,13 @@
+"""nuereview URL Configuration served under ASGI
+
+The same routes as nuereview.urls, with the read views of places replaced
+by their async variants from places.async_views.
+"""
+from django.urls import include, path
+
+from . import urls
+
+urlpatterns = [
+    path('places/', include('places.async_urls')),
+] + [pattern for pattern in urls.urlpatterns
+    if str(pattern.pattern) != 'places/']
@@ -0,0 +1,245 @@
+"""
+Per-view request metrics exposed in the Prometheus text format.
+
+MetricsMiddleware records the latency, the number of SQL queries and the
+total SQL time of every request as histograms labelled with the view's URL
+name, and logs requests slower than METRICS_SLOW_REQUEST_MS along with their
+slowest queries. Queries are timed with a database execute wrapper, which
+works with DEBUG off. It is installed on every connection and times the
+request of the current context, so the threads of async views count too.
+Streamed responses are recorded once their content is sent, with the
+queries run while streaming. The histograms are kept per process, so each
+worker process has to be scraped on its own, with the METRICS_TOKEN.
+"""
+from bisect import bisect_left
+import contextvars
+import heapq
+import hmac
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .middleware import AsyncCapableMiddleware
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = getattr(settings, 'METRICS_SLOW_REQUEST_MS', 500)
+
+# Number of queries logged with a slow request
+SLOWEST_QUERIES = 5
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    """
+    Cumulative histogram of observations for each label value
+    """
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self.lock:
+            counts, total = self.series.get(label,
+                ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self.series[label] = (counts, total + value)
+
+    def render(self):
+        lines = [
+            '# HELP %s %s' % (self.name, self.help_text),
+            '# TYPE %s histogram' % self.name,
+        ]
+        with self.lock:
+            series = sorted((label, list(counts), total)
+                for label, (counts, total) in self.series.items())
+        for label, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append('%s_bucket{view="%s",le="%s"} %d' % (
+                    self.name, label, bound, cumulative))
+            lines.append('%s_sum{view="%s"} %s' % (self.name, label, total))
+            lines.append('%s_count{view="%s"} %d' % (
+                self.name, label, cumulative))
+        return lines
+
+
+REQUEST_SECONDS = Histogram('nuereview_request_duration_seconds',
+    'Request latency by view', TIME_BUCKETS)
+REQUEST_QUERIES = Histogram('nuereview_request_queries',
+    'SQL queries per request by view', QUERY_BUCKETS)
+REQUEST_SQL_SECONDS = Histogram('nuereview_request_sql_duration_seconds',
+    'Total SQL time per request by view', TIME_BUCKETS)
+
+HISTOGRAMS = (REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_SQL_SECONDS)
+
+
+class QueryTimer:
+    """
+    Database execute wrapper counting and timing the queries it runs
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest = []
+        # Async views run queries from several threads at once
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.count += 1
+                self.seconds += elapsed
+                if len(self.slowest) < SLOWEST_QUERIES:
+                    heapq.heappush(self.slowest, (elapsed, sql))
+                elif elapsed > self.slowest[0][0]:
+                    heapq.heapreplace(self.slowest, (elapsed, sql))
+
+
+# Timer of the current request, also seen by the threads running its ORM
+# work as contexts are copied into them
+current_timer = contextvars.ContextVar('current_timer', default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install(connection, **kwargs):
+    """
+    Adds the request timer dispatch to a connection's execute wrappers
+    """
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+connection_created.connect(install)
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+
+    def call(self, request):
+        # Connections opened before this module was imported
+        for connection in connections.all():
+            install(connection)
+        timer = QueryTimer()
+        token = current_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.finish(request, response, timer, start)
+
+    async def acall(self, request):
+        timer = QueryTimer()
+        token = current_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.finish(request, response, timer, start)
+
+    def finish(self, request, response, timer, start):
+        if response.streaming:
+            # Streamed content runs its queries after this returns
+            response.streaming_content = self.stream(request,
+                response.streaming_content, timer, start)
+        else:
+            self.record(request, timer, time.perf_counter() - start)
+        return response
+
+    def stream(self, request, content, timer, start):
+        """
+        Yields the streamed content, timing its queries with the request's,
+        and records the request once it is sent
+        """
+        content = iter(content)
+        try:
+            while True:
+                token = current_timer.set(timer)
+                try:
+                    chunk = next(content)
+                except StopIteration:
+                    return
+                finally:
+                    current_timer.reset(token)
+                yield chunk
+        finally:
+            self.record(request, timer, time.perf_counter() - start)
+
+    def record(self, request, timer, elapsed):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        if view == 'metrics':
+            return
+        REQUEST_SECONDS.observe(view, elapsed)
+        REQUEST_QUERIES.observe(view, timer.count)
+        REQUEST_SQL_SECONDS.observe(view, timer.seconds)
+
+        if elapsed * 1000 > SLOW_REQUEST_MS:
+            logger.warning('Slow request %s %s (%s) took %.0fms with %d '
+                'queries in %.0fms, slowest:\n%s', request.method,
+                request.path, view, elapsed * 1000, timer.count,
+                timer.seconds * 1000, '\n'.join('  %.1fms %s' % (
+                    seconds * 1000, sql) for seconds, sql
+                    in sorted(timer.slowest, reverse=True)))
+
+
+def authorized(request):
+    """
+    Returns whether a request sends the METRICS_TOKEN as a bearer token or
+    comes from a staff user
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer ' + token):
+        return True
+    return request.user.is_staff
+
+
+def metrics(request):
+    """
+    Serves the metrics to scrapers with the token and to staff users
+    """
+    if not authorized(request):
+        return HttpResponseForbidden()
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+
+    from places import queue
+    stats = queue.stats()
+    lines.extend([
+        '# HELP nuereview_scorecard_queue_depth Places waiting for a recount',
+        '# TYPE nuereview_scorecard_queue_depth gauge',
+        'nuereview_scorecard_queue_depth %d' % stats['depth'],
+        '# HELP nuereview_scorecard_queue_lag_seconds Age of the oldest '
+            'waiting recount',
+        '# TYPE nuereview_scorecard_queue_lag_seconds gauge',
+        'nuereview_scorecard_queue_lag_seconds %s' % stats['lag'],
+    ])
+    return HttpResponse('\n'.join(lines) + '\n',
+        content_type='text/plain; version=0.0.4; charset=utf-8')
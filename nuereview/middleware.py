@@ -0,0 +1,32 @@
+"""
+Base of the middleware serving both the WSGI and the ASGI entry points.
+"""
+import asyncio
+
+
+class AsyncCapableMiddleware:
+    """
+    Middleware Django runs in sync or async mode, matching the handler it
+    wraps. Subclasses implement call() for sync requests and acall() for
+    async ones
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the instance as a coroutine function, like Django's
+            # MiddlewareMixin
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.acall(request)
+        return self.call(request)
+
+    def call(self, request):
+        raise NotImplementedError
+
+    async def acall(self, request):
+        raise NotImplementedError
@@ -0,0 +1,86 @@
+"""
+Routing of reads to the read replicas in DATABASE_REPLICAS.
+
+All writes go to the default (primary) database. Reads go to a random
+replica only inside safe requests, as marked by ReplicaMiddleware, so
+management commands and the scorecard worker always read the primary.
+Once a request writes, its remaining reads go to the primary, and the
+response pins the client to the primary for REPLICA_PIN_SECONDS so they
+see their own writes while the replicas catch up.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.urls import reverse
+
+from .middleware import AsyncCapableMiddleware
+
+PIN_COOKIE = 'pin_primary'
+
+use_replicas = contextvars.ContextVar('use_replicas', default=False)
+wrote = contextvars.ContextVar('wrote', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if replicas and use_replicas.get():
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        use_replicas.set(False)
+        wrote.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every database holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        return db not in get_replicas()
+
+
+class ReplicaMiddleware(AsyncCapableMiddleware):
+
+    def is_pinned(self, request):
+        return (request.method not in ('GET', 'HEAD', 'OPTIONS')
+            or PIN_COOKIE in request.COOKIES
+            or request.path.startswith(reverse('admin:index')))
+
+    def call(self, request):
+        tokens = self.start(request)
+        try:
+            return self.finish(self.get_response(request))
+        finally:
+            self.reset(tokens)
+
+    async def acall(self, request):
+        tokens = self.start(request)
+        try:
+            return self.finish(await self.get_response(request))
+        finally:
+            self.reset(tokens)
+
+    def start(self, request):
+        return (use_replicas.set(not self.is_pinned(request)),
+            wrote.set(False))
+
+    def finish(self, response):
+        if wrote.get():
+            response.set_cookie(PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                httponly=True, samesite='Lax')
+        return response
+
+    def reset(self, tokens):
+        replicas_token, wrote_token = tokens
+        use_replicas.reset(replicas_token)
+        wrote.reset(wrote_token)
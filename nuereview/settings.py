@@ -42,9 +42,12 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 MIDDLEWARE = [
+    'nuereview.metrics.MetricsMiddleware',
+    'nuereview.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,9 +55,12 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Last, so snapshots get the headers of the middleware above
+    'places.snapshots.SnapshotMiddleware',
 ]
 
-ROOT_URLCONF = 'nuereview.urls'
+# nuereview.asgi serves nuereview.async_urls
+ROOT_URLCONF = os.environ.get('NUEREVIEW_URLCONF', 'nuereview.urls')
 
 TEMPLATES = [
     {
@@ -87,9 +93,99 @@ DATABASES = {
         'PASSWORD': 'Grimace#20',
         'HOST': 'localhost',
         'PORT': '5432',
+        # Kept open between requests, the ORM threads of the async views
+        # would otherwise connect again for every query they run
+        'CONN_MAX_AGE': 60,
+    },
+    # Read replicas are added like the primary and listed in
+    # DATABASE_REPLICAS, e.g. to try it locally with a copy of the database:
+    # 'replica': {
+    #     'ENGINE': 'django.db.backends.postgresql_psycopg2',
+    #     'NAME': 'nuereviewdb_replica',
+    #     ...
+    #     'TEST': {'MIRROR': 'default'},
+    # },
+}
+
+# Safe requests read from a random replica, see nuereview.routers
+DATABASE_ROUTERS = ['nuereview.routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# How long a client reads from the primary after writing
+REPLICA_PIN_SECONDS = 10
+
+# Threads running the ORM for the async views of an ASGI process, at most
+# one database connection each, see places.async_views
+ASYNC_ORM_THREADS = 8
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Place pages are cached per place version (see places.cache). Local memory
+# is per process, use the file based backend to share invalidations
+# between several worker processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+PLACE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Reviews a user and a place may receive: burst capacity and refill per
+# minute, see places.throttle
+REVIEW_RATE_LIMITS = {
+    'user': (5, 1),
+    'place': (60, 60),
+}
+# Seconds during which a resubmitted review is not written again
+REVIEW_IDEMPOTENCY_WINDOW = 60 * 10
+
+
+# Scorecards
+# New reviews queue a recount of their place's scorecard for the
+# process_scorecards worker. Set to False to update scorecards within the
+# request instead, e.g. when running without the worker.
+
+SCORECARD_QUEUE = True
+
+
+# Analytics
+# Every process keeps an in-memory cube of rating counts for
+# /places/api/analytics/, adding new reviews every CUBE_REFRESH_SECONDS and
+# counting them all again every CUBE_REBUILD_SECONDS, see places.cube
+
+CUBE_REFRESH_SECONDS = 60
+CUBE_REBUILD_SECONDS = 60 * 60
+
+
+# Similar places
+# Detail pages list the similar places within this scope ('all', 'state' or
+# 'suburb') found by the rebuild_similar_places command
+
+SIMILAR_PLACES_SCOPE = 'state'
+
+
+# Snapshots
+# Anonymous visitors get the front page and the detail pages of the
+# SNAPSHOT_PLACES top ranked places prerendered, written below SNAPSHOT_ROOT
+# by the process_snapshots worker, see places.snapshots. Unset, e.g. in
+# development and tests, pages are always rendered live.
+
+SNAPSHOT_ROOT = os.getenv('SNAPSHOT_ROOT')
+SNAPSHOT_PLACES = 100
+
+
+# Metrics
+# Requests slower than this are logged with their slowest SQL queries
+
+METRICS_SLOW_REQUEST_MS = 500
+
+# Scrapers send it as 'Authorization: Bearer <token>', staff users can read
+# the metrics without it. Unset, only staff users can
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -128,14 +224,32 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
     'django.contrib.staticfiles.finders.AppDirectoriesFinder',
     'sass_processor.finders.CssFinder',
 ]
 
+# Assets are built by the build_static command: hashed names for caching
+# forever, with gzip and brotli variants, see nuereview.storage
+STATICFILES_STORAGE = 'nuereview.storage.CompressedManifestStaticFilesStorage'
+# Without a manifest, only development and tests (which run with the DEBUG
+# set here) serve static files under their source names
+STATIC_MANIFEST_REQUIRED = not DEBUG
+
+# Files concatenated into each bundle by build_static, written below
+# static/bundles
+STATIC_BUNDLES = {
+    'site.js': ['js/jquery.min.js'],
+}
+
 # Django Sass
 SASS_PROCESSOR_ROOT = os.path.join(BASE_DIR,'static')
+# SCSS is compiled by build_static, never while serving a request
+SASS_PROCESSOR_ENABLED = False
 
 LOGIN_REDIRECT_URL = '/places/'
 
@@ -0,0 +1,60 @@
+"""
+Static files storage writing fingerprinted, precompressed assets.
+
+collectstatic stores every file under a name carrying a hash of its content
+and records the names in a manifest, which {% static %} reads, so assets
+can be cached by browsers forever. Text assets also get .gz and, when the
+brotli package is installed, .br siblings for the web server to send as
+they are, e.g. with nginx's gzip_static and brotli_static.
+"""
+import gzip
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.txt', '.map',
+    '.html', '.xml', '.ttf', '.eot')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            # Before the first build_static there is no manifest. Only
+            # development and tests serve names as they are, elsewhere it
+            # means the build was missed
+            if getattr(settings, 'STATIC_MANIFEST_REQUIRED', True):
+                raise ValueError('There is no staticfiles manifest in %s, '
+                    'run build_static' % self.location)
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, *args, **kwargs):
+        yield from super().post_process(*args, **kwargs)
+        if kwargs.get('dry_run'):
+            return
+        # The final names, earlier passes' intermediate files are deleted
+        for hashed_name in sorted(set(self.hashed_files.values())):
+            if hashed_name.endswith(COMPRESSED_EXTENSIONS):
+                self.compress(hashed_name)
+
+    def compress(self, name):
+        """
+        Writes the compressed variants of a stored file that are smaller
+        """
+        with self.open(name) as f:
+            content = f.read()
+        variants = [('.gz', gzip.compress(content, 9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+        for extension, compressed in variants:
+            if len(compressed) < len(content):
+                if self.exists(name + extension):
+                    self.delete(name + extension)
+                self._save(name + extension, ContentFile(compressed))
@@ -0,0 +1,191 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache as django_cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from places import cache
+from places.models import Place
+from . import metrics, routers
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        for histogram in metrics.HISTOGRAMS:
+            histogram.series.clear()
+
+    def test_requests_are_recorded_by_view(self):
+        self.client.get(reverse('places:index'))
+        self.client.get(reverse('places:index'))
+        self.client.force_login(User.objects.create_user('staff',
+            is_staff=True))
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('nuereview_request_duration_seconds_count'
+            '{view="places:index"} 2', body)
+        self.assertIn('nuereview_request_queries_bucket'
+            '{view="places:index",le="+Inf"} 2', body)
+        self.assertIn('nuereview_scorecard_queue_depth 0', body)
+        self.assertNotIn('view="metrics"', body)
+
+    def test_query_count(self):
+        self.client.get(reverse('places:index'))
+        queries = metrics.REQUEST_QUERIES.series['places:index'][1]
+        self.assertEqual(queries, 1)
+
+    def test_slow_requests_are_logged(self):
+        with mock.patch.object(metrics, 'SLOW_REQUEST_MS', -1), \
+                self.assertLogs('nuereview.metrics') as logs:
+            self.client.get(reverse('places:index'))
+        self.assertIn('places:index', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_or_staff_required(self):
+        # Local addresses may be a reverse proxy
+        response = self.client.get('/metrics', REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get('/metrics',
+            HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get('/metrics',
+            HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+
+    def test_streamed_queries_are_counted(self):
+        response = self.client.get(reverse('places:api_list'))
+        self.assertNotIn('places:api_list', metrics.REQUEST_QUERIES.series)
+        b''.join(response.streaming_content)
+        queries = metrics.REQUEST_QUERIES.series['places:api_list'][1]
+        self.assertEqual(queries, 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, request, write=False):
+        """
+        Returns the databases of a read, a write if asked and another read
+        in a request, and the response
+        """
+        used = []
+
+        def view(request):
+            used.append(self.router.db_for_read(Place))
+            if write:
+                used.append(self.router.db_for_write(Place))
+                used.append(self.router.db_for_read(Place))
+            return HttpResponse()
+
+        response = routers.ReplicaMiddleware(view)(request)
+        return used, response
+
+    def test_safe_requests_read_replicas(self):
+        used, response = self.route(self.factory.get('/places/'))
+        self.assertEqual(used, ['replica'])
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_writes_pin_the_primary(self):
+        used, response = self.route(self.factory.get('/places/'), write=True)
+        self.assertEqual(used, ['replica', 'default', 'default'])
+        self.assertEqual(response.cookies[routers.PIN_COOKIE]['max-age'], 10)
+        request = self.factory.get('/places/')
+        request.COOKIES[routers.PIN_COOKIE] = '1'
+        self.assertEqual(self.route(request)[0], ['default'])
+
+    def test_posts_and_admin_read_the_primary(self):
+        self.assertEqual(self.route(self.factory.post('/places/1/postreview/')
+            )[0], ['default'])
+        self.assertEqual(self.route(self.factory.get('/admin/'))[0],
+            ['default'])
+
+    def test_outside_requests_read_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Place), 'default')
+
+    def test_cached_place_data_is_read_from_the_primary(self):
+        place = Place.objects.create(name='The Local', suburb='Newtown',
+            state='NSW', postcode='2042')
+        django_cache.clear()
+        token = routers.use_replicas.set(True)
+        self.addCleanup(routers.use_replicas.reset, token)
+        # The replica alias is not configured, reading it would fail
+        place, version = cache.cached_place(place.pk)
+        self.assertEqual(cache.cached_ranks(place), {})
+        self.assertEqual(cache.cached_similar(place.pk), [])
+
+    def test_postreview_pins_the_reviewer(self):
+        self.client.force_login(User.objects.create_user('alice'))
+        place = Place.objects.create(name='The Local', suburb='Newtown',
+            state='NSW', postcode='2042')
+        response = self.client.post(reverse('places:postreview',
+            args=(place.pk,)), {'food': 'good', 'decor': 'poor',
+            'value': 'good'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+
+
+class StaticBuildTests(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.source = os.path.join(self.dir.name, 'static')
+        shutil.copytree(settings.STATICFILES_DIRS[0], self.source)
+        self.root = os.path.join(self.dir.name, 'staticfiles')
+
+    def test_build(self):
+        with override_settings(STATICFILES_DIRS=[self.source],
+                STATIC_ROOT=self.root):
+            call_command('build_static', stdout=StringIO())
+            with open(os.path.join(self.root, 'staticfiles.json')) as f:
+                paths = json.load(f)['paths']
+            name = paths['bundles/site.js']
+            self.assertRegex(name, r'^bundles/site\.[0-9a-f]{12}\.js$')
+            self.assertEqual(staticfiles_storage.url('bundles/site.js'),
+                '/static/' + name)
+            self.assertEqual(Template("{% load bundles %}"
+                "{% bundle 'site.js' %}").render(Context()),
+                '<script src="/static/%s"></script>' % name)
+            path = os.path.join(self.root, name)
+            with open(path, 'rb') as f, gzip.open(path + '.gz') as gz:
+                self.assertEqual(gz.read(), f.read())
+            with open(os.path.join(self.source, 'js', 'jquery.min.js'),
+                    'rb') as f:
+                jquery = f.read()
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), jquery)
+
+    def test_unbuilt_names_are_served_as_they_are(self):
+        with override_settings(STATIC_ROOT=self.root):
+            self.assertEqual(staticfiles_storage.url('js/jquery.min.js'),
+                '/static/js/jquery.min.js')
+            # The bundle's sources until it is built
+            self.assertEqual(Template("{% load bundles %}"
+                "{% bundle 'site.js' %}").render(Context()),
+                '<script src="/static/js/jquery.min.js"></script>')
+
+    def test_missing_manifest_is_an_error_outside_development(self):
+        with override_settings(STATIC_ROOT=self.root,
+                STATIC_MANIFEST_REQUIRED=True):
+            with self.assertRaisesMessage(ValueError, 'run build_static'):
+                staticfiles_storage.url('js/jquery.min.js')
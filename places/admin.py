@@ -1,21 +1,75 @@
+import json
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
 from .models import Place, Review, Feedback, Scorecard
 
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator using the planner's row estimate instead of an exact COUNT(*)
+    on Postgres once that estimate is above ESTIMATE_THRESHOLD, so listing a
+    huge table does not scan it. Counts of small results stay exact
+    """
+    ESTIMATE_THRESHOLD = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = int(plan[0]['Plan']['Plan Rows'])
+            if estimate > self.ESTIMATE_THRESHOLD:
+                return estimate
+        return queryset.count()
+
+
 class FeedbackInline(admin.StackedInline):
     model = Feedback
+    # The masks are derived from the attributes on save
+    exclude = ['positive', 'negative']
+    can_delete = False
 
 class ScorecardInline(admin.TabularInline):
     model = Scorecard
+    # Scores are counted from reviews, edit those instead
+    fields = ['scores', 'updated']
+    readonly_fields = ['scores', 'updated']
+    can_delete = False
+    max_num = 0
 
 class PlaceAdmin(admin.ModelAdmin):
     fieldsets = [
         (None,  {'fields': ['name']}),
         ('Address', {'fields': ['street_address', 'suburb', 'state','postcode']}),
+        ('Location', {'fields': ['latitude', 'longitude']}),
     ]
     inlines = [ScorecardInline]
+    list_display = ['name', 'suburb', 'state', 'postcode', 'rank']
+    list_filter = ['state']
+    # Contains lookups served by the trigram indexes of places.search
+    search_fields = ['name', 'suburb']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 class ReviewAdmin(admin.ModelAdmin):
+    # A reviewer's history is the changelist filtered by ?reviewer__id__exact=
+    list_display = ['visit_date', 'place', 'reviewer', 'ratings']
+    list_select_related = ['place', 'reviewer', 'feedback']
+    ordering = ['-visit_date', '-id']
+    autocomplete_fields = ['place', 'reviewer']
+    search_fields = ['place__name']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fieldsets = [
         ('Date & Time', {'fields': ['visit_date']}),
         ('Place', {'fields': ['place']}),
@@ -23,5 +77,11 @@ class ReviewAdmin(admin.ModelAdmin):
     ]
     inlines =  [FeedbackInline]
 
+    def ratings(self, review):
+        if not hasattr(review, 'feedback'):
+            return ''
+        return ', '.join(['+' + name for name in review.feedback.get_good()]
+            + ['-' + name for name in review.feedback.get_poor()])
+
 admin.site.register(Place, PlaceAdmin)
 admin.site.register(Review, ReviewAdmin)
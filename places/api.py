@@ -0,0 +1,239 @@
+"""
+JSON read API for places and scorecards.
+
+Responses carry an ETag from the cache versions in places.cache, and place
+responses a Last-Modified from the place and its scorecard, so polling
+clients get 304 Not Modified until something changes.
+"""
+import json
+
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import condition, require_GET
+
+from . import (cache, codec, cube, geo, leaderboards, listing, rollups,
+    search)
+from .models import Place, ScoreRollup
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+PLACE_FIELDS = ('id', 'name', 'street_address', 'suburb', 'state',
+    'postcode', 'latitude', 'longitude', 'rank')
+
+# Furthest a nearby search may reach, in kilometres
+MAX_RADIUS_KM = 100
+
+
+def place_json(place):
+    data = {field: getattr(place, field) for field in PLACE_FIELDS}
+    data['url'] = reverse('places:api_detail', args=(place.pk,))
+    return data
+
+
+def scorecard_json(place):
+    if not hasattr(place, 'scorecard'):
+        return {'scores': {}, 'updated': None}
+    return {
+        'scores': place.scorecard.scores,
+        'updated': place.scorecard.updated.isoformat(),
+    }
+
+
+def place_etag(request, pk):
+    return '%d-%d' % (pk, cache.place_version(pk))
+
+
+def place_last_modified(request, pk):
+    try:
+        place, version = cache.cached_place(pk)
+    except Http404:
+        return None
+    if hasattr(place, 'scorecard'):
+        return max(place.updated, place.scorecard.updated)
+    return place.updated
+
+
+def listing_etag(request):
+    return 'places-%d' % cache.listing_version()
+
+
+def place_rows(request):
+    """
+    Returns the rows of the page of places by rank a request asks for, one
+    more than its limit, and the limit
+    """
+    places = listing.by_rank(Place.objects.all())
+    state = request.GET.get('state', '')
+    if state in search.STATES:
+        places = places.filter(state=state)
+    places = listing.after(places, request.GET.get('after', ''))
+    limit = request.GET.get('limit', '')
+    # At least one row, so that a next page has a cursor
+    limit = (max(1, min(int(limit), MAX_PAGE_SIZE)) if limit.isdigit()
+        else PAGE_SIZE)
+    rows = places.values_list(*PLACE_FIELDS, 'scorecard__scores')[:limit + 1]
+    return rows, limit
+
+
+def stream_places(rows, limit):
+    yield '{"results": ['
+    last = None
+    for i, row in enumerate(rows):
+        if i == limit:
+            yield '], "next": %s}' % json.dumps(
+                listing.cursor(last['rank'], last['id']))
+            return
+        data = dict(zip(PLACE_FIELDS, row))
+        data['url'] = reverse('places:api_detail', args=(data['id'],))
+        data['scores'] = row[-1] or {}
+        yield (', ' if i else '') + json.dumps(data)
+        last = data
+    yield '], "next": null}'
+
+
+@require_GET
+@condition(etag_func=listing_etag)
+def place_list(request):
+    """
+    Streams a page of places by rank, continued with the 'next' cursor
+    """
+    rows, limit = place_rows(request)
+    # Routed now, the rows are streamed after the middleware has returned
+    rows = rows.using(rows.db)
+    return StreamingHttpResponse(stream_places(rows.iterator(), limit),
+        content_type='application/json')
+
+
+@require_GET
+@condition(etag_func=place_etag, last_modified_func=place_last_modified)
+def place_detail(request, pk):
+    place, version = cache.cached_place(pk)
+    data = place_json(place)
+    data['scorecard'] = scorecard_json(place)
+    return JsonResponse(data)
+
+
+@require_GET
+@condition(etag_func=place_etag, last_modified_func=place_last_modified)
+def place_scorecard(request, pk):
+    place, version = cache.cached_place(pk)
+    return JsonResponse(scorecard_json(place))
+
+
+@require_GET
+def place_trends(request, pk):
+    """
+    Returns the ratings of the last 30 and 90 days (or the comma separated
+    'days') and the last 'count' buckets of a 'period' per attribute
+    """
+    place, version = cache.cached_place(pk)
+    days = [int(d) for d in request.GET.get('days', '30,90').split(',')
+        if d.isdigit() and 0 < int(d) <= 3660]
+    period = request.GET.get('period', ScoreRollup.WEEK)
+    if period not in rollups.PERIODS:
+        period = ScoreRollup.WEEK
+    count = request.GET.get('count', '')
+    count = min(int(count), 366) if count.isdigit() and int(count) else 12
+    return JsonResponse({
+        'windows': {str(d): rollups.window(place.pk, d) for d in days},
+        'trend': {
+            'period': period,
+            'buckets': [{
+                'start': start.isoformat(),
+                'scores': {attr: {'positive': positive, 'negative': negative}
+                    for attr, (positive, negative) in scores.items()},
+                } for start, scores in rollups.trend(place.pk, period, count)],
+        },
+    })
+
+
+@require_GET
+def leaderboard(request, attribute):
+    """
+    Returns the top places for an attribute in a 'suburb' or a 'state'
+    """
+    if attribute not in codec.ATTRIBUTES:
+        raise Http404('Unknown attribute')
+    suburb = request.GET.get('suburb', '')
+    state = request.GET.get('state', '')
+    if not suburb and state not in search.STATES:
+        return JsonResponse({'error': 'A suburb or a state is required'},
+            status=400)
+    limit = request.GET.get('limit', '')
+    limit = min(int(limit), MAX_PAGE_SIZE) if limit.isdigit() else 10
+    entries = leaderboards.top(attribute, suburb=suburb, state=state,
+        limit=limit)
+    return JsonResponse({'results': [dict(place_json(entry.place),
+        score=entry.score) for entry in entries]})
+
+
+def coordinate(value, bound):
+    try:
+        value = float(value)
+    except ValueError:
+        return None
+    return value if -bound <= value <= bound else None
+
+
+@require_GET
+def nearby(request):
+    """
+    Returns the 'limit' places nearest to 'lat' and 'lon' within 'radius'
+    kilometres (5 by default, at most MAX_RADIUS_KM), nearest first
+    """
+    latitude = coordinate(request.GET.get('lat', ''), 90)
+    longitude = coordinate(request.GET.get('lon', ''), 180)
+    if latitude is None or longitude is None:
+        return JsonResponse({'error': 'A valid lat and lon are required'},
+            status=400)
+    radius = request.GET.get('radius', '')
+    radius = coordinate(radius, MAX_RADIUS_KM) if radius else 5
+    if radius is None or radius <= 0:
+        return JsonResponse({'error': 'The radius must be over 0 and at '
+            'most %d km' % MAX_RADIUS_KM}, status=400)
+    limit = request.GET.get('limit', '')
+    limit = min(int(limit), MAX_PAGE_SIZE) if limit.isdigit() else 10
+    found = geo.nearest(Place.objects.all(), latitude, longitude, k=limit,
+        max_km=radius)
+    return JsonResponse({'results': [dict(place_json(place),
+        distance_km=round(distance, 3)) for distance, place in found]})
+
+
+@require_GET
+def analytics(request):
+    """
+    Returns rating counts from the analytics cube for staff, by the comma
+    separated 'group' dimensions, filtered by 'state', 'suburb', 'postcode'
+    prefix, comma separated 'attribute's and 'from' and 'to' months
+    (YYYY-MM). 'digits' sets the postcode prefix grouped by
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff only'}, status=403)
+    if cube.numpy is None:
+        return JsonResponse({'error': 'Analytics need numpy'}, status=503)
+    group_by = [d for d in request.GET.get('group', '').split(',') if d]
+    attributes = [a for a in request.GET.get('attribute', '').split(',') if a]
+    months = {}
+    for param in ('from', 'to'):
+        value = request.GET.get(param, '')
+        months[param] = cube.parse_month(value) if value else None
+        if value and months[param] is None:
+            return JsonResponse({'error': 'Invalid %s month' % param},
+                status=400)
+    if (set(group_by) - set(cube.DIMENSIONS)
+            or set(attributes) - set(codec.ATTRIBUTES)):
+        return JsonResponse({'error': 'Unknown dimension or attribute'},
+            status=400)
+    digits = request.GET.get('digits', '')
+    digits = min(int(digits), 4) if digits.isdigit() and int(digits) else 4
+    current = cube.get_cube()
+    return JsonResponse({
+        'groups': current.query(group_by,
+            state=request.GET.get('state'),
+            suburb=request.GET.get('suburb'),
+            postcode=request.GET.get('postcode'),
+            attributes=attributes, first=months['from'], last=months['to'],
+            postcode_digits=digits),
+        'last_review': current.last_review,
+    })
@@ -0,0 +1,19 @@
+from django.urls import path
+
+from . import async_views, urls
+
+# The read routes of places.urls, served by the async views
+ASYNC_VIEWS = {
+    'index': async_views.index,
+    'detail': async_views.detail,
+    'api_list': async_views.place_list,
+    'api_detail': async_views.place_detail,
+    'api_scorecard': async_views.place_scorecard,
+}
+
+app_name = 'places'
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name)
+    if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in urls.urlpatterns
+]
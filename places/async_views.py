@@ -0,0 +1,97 @@
+"""
+Async variants of the read views, served by the ASGI entry point.
+
+The ORM is synchronous, so database and cache work runs on one pool of
+ASYNC_ORM_THREADS threads shared by every request of the process. That
+bounds the database connections a process opens however many requests it
+holds, lets a view fetch independent data concurrently, and leaves slow
+clients waiting on the event loop instead of tying up a thread each. The
+threads keep their connections for CONN_MAX_AGE seconds; with the default
+of 0 every call would open a new one.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
+from django.views.decorators.http import condition, require_GET
+
+from . import api, cache, views
+
+EXECUTOR = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ASYNC_ORM_THREADS', 8),
+    thread_name_prefix='places-orm')
+
+
+def orm(func):
+    """
+    Returns an async function running func on the ORM thread pool
+    """
+    def call(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # As at the end of a sync request, for the pool thread's own
+            # connections, which are kept open until CONN_MAX_AGE passes
+            close_old_connections()
+    return sync_to_async(call, thread_sensitive=False, executor=EXECUTOR)
+
+
+def rendered(view):
+    """
+    Wraps a view so that template responses are rendered in its thread,
+    templates may still touch the ORM, e.g. through request.user
+    """
+    def call(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+    return call
+
+
+index_view = rendered(views.IndexView.as_view())
+
+
+async def index(request):
+    return await orm(index_view)(request)
+
+
+async def detail(request, pk):
+    place, version = await orm(cache.cached_place)(pk)
+    ranks, similar = await asyncio.gather(
+        orm(cache.cached_ranks)(place),
+        orm(cache.cached_similar)(pk))
+    return await orm(render)(request, 'places/detail.html', {
+        'object': place,
+        'place': place,
+        'place_version': version,
+        'cache_timeout': cache.TIMEOUT,
+        'ranks': ranks,
+        'similar_places': similar,
+    })
+
+
+@require_GET
+@condition(etag_func=api.listing_etag)
+def buffered_place_list(request):
+    # ASGI iterates streaming responses on the event loop, so the rows are
+    # read here and only the JSON is streamed
+    rows, limit = api.place_rows(request)
+    return StreamingHttpResponse(api.stream_places(list(rows), limit),
+        content_type='application/json')
+
+
+async def place_list(request):
+    return await orm(buffered_place_list)(request)
+
+
+async def place_detail(request, pk):
+    return await orm(api.place_detail)(request, pk)
+
+
+async def place_scorecard(request, pk):
+    return await orm(api.place_scorecard)(request, pk)
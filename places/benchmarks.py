@@ -0,0 +1,139 @@
+"""
+Benchmarks of the review hot paths, run against the current database.
+
+Each case is timed over a number of repeats and reports its latency
+percentiles in milliseconds and the most SQL queries any repeat ran. The
+throughput benchmark compares the read views served by concurrent WSGI
+threads with the async views served over ASGI. The benchmark command runs
+them on a throwaway database of synthetic data.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from .models import Scorecard
+
+
+def measure(func, repeat):
+    """
+    Calls func(i) for i in range(repeat), returns its timings and queries
+    """
+    timings = []
+    queries = 0
+    for i in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            func(i)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = max(queries, len(captured.captured_queries))
+    timings.sort()
+    return {
+        'repeat': repeat,
+        'min_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[int(0.95 * (len(timings) - 1))], 3),
+        'max_ms': round(timings[-1], 3),
+        'queries': queries,
+    }
+
+
+def check(response, status=200):
+    if response.status_code != status:
+        # WSGI environ or ASGI scope
+        path = response.request.get('PATH_INFO') or response.request['path']
+        raise AssertionError('%s returned %d' % (path, response.status_code))
+
+
+def run(place_ids, user, repeat=20):
+    """
+    Runs every benchmark case, place_ids should list the hottest places
+    first and user is the reviewer posting the benchmark reviews
+    """
+    client = Client()
+    reviewer = Client()
+    reviewer.force_login(user)
+    hot = place_ids[0]
+    hottest = place_ids[:10]
+    review = {'food': 'good', 'service': 'poor', 'value': 'good'}
+    results = {}
+
+    keys = iter(range(2 * repeat))
+
+    def post_review(i):
+        check(reviewer.post(reverse('places:postreview',
+            args=(hottest[i % len(hottest)],)),
+            dict(review, idempotency_key=next(keys))), 302)
+
+    # Every review is written, none throttled
+    unlimited = {'user': (repeat * 2, 60000), 'place': (repeat * 2, 60000)}
+    with override_settings(SCORECARD_QUEUE=False,
+            REVIEW_RATE_LIMITS=unlimited):
+        results['postreview'] = measure(post_review, repeat)
+    with override_settings(SCORECARD_QUEUE=True,
+            REVIEW_RATE_LIMITS=unlimited):
+        results['postreview_queued'] = measure(post_review, repeat)
+
+    results['rebuild_scorecard'] = measure(
+        lambda i: Scorecard.rebuild([hot]), repeat)
+
+    results['index'] = measure(lambda i: check(
+        client.get(reverse('places:index'))), repeat)
+
+    def detail_cold(i):
+        cache.clear()
+        check(client.get(reverse('places:detail', args=(hot,))))
+
+    results['detail_cold'] = measure(detail_cold, repeat)
+    results['detail_warm'] = measure(lambda i: check(
+        client.get(reverse('places:detail', args=(hot,)))), repeat)
+    return results
+
+
+def throughput(place_ids, concurrency=16, requests=500):
+    """
+    Returns the requests per second of the index, detail and API reads of
+    the hottest places, made by concurrency clients at a time through WSGI
+    threads and through ASGI
+    """
+    paths = [reverse('places:index')]
+    for pk in place_ids[:10]:
+        paths += [reverse('places:detail', args=(pk,)),
+            reverse('places:api_detail', args=(pk,))]
+
+    def get(i):
+        check(Client().get(paths[i % len(paths)]))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(get, range(requests)))
+    wsgi_seconds = time.perf_counter() - start
+
+    async def get_all():
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def get(i):
+            async with semaphore:
+                check(await client.get(paths[i % len(paths)]))
+
+        await asyncio.gather(*(get(i) for i in range(requests)))
+
+    with override_settings(ROOT_URLCONF='nuereview.async_urls'):
+        start = time.perf_counter()
+        async_to_sync(get_all)()
+        asgi_seconds = time.perf_counter() - start
+
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'wsgi_per_second': round(requests / wsgi_seconds, 1),
+        'asgi_per_second': round(requests / asgi_seconds, 1),
+    }
@@ -0,0 +1,150 @@
+"""
+Versioned caching of place detail data.
+
+Every place has a version number in the cache which is bumped whenever the
+place or its scorecard changes, and all cached data of a place is keyed on
+it, so a bump invalidates exactly that place's entries. Suburb leaderboard
+ranks are keyed on a version of the suburb, bumped by changes to its
+places, similar places on one version bumped by rebuild_similar_places and
+place changes, and the listings share one version which any change bumps.
+Works with any cache backend, though processes only share invalidations
+through a shared backend such as the file based one.
+"""
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from . import leaderboards, similarity
+from .models import Place
+
+TIMEOUT = getattr(settings, 'PLACE_CACHE_TIMEOUT', 60 * 60 * 24)
+
+LISTING_VERSION_KEY = 'places:listing:version'
+
+SIMILAR_VERSION_KEY = 'places:similar:version'
+
+
+def version_key(place_id):
+    return 'places:place:%d:version' % place_id
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a lost version never repeats an old one
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def place_version(place_id):
+    """
+    Returns the current cache version of a place
+    """
+    return get_version(version_key(place_id))
+
+
+def bump_place_version(place_id):
+    """
+    Invalidates everything cached for a place
+    """
+    bump_version(version_key(place_id))
+
+
+def suburb_version_key(suburb):
+    return 'places:suburb:%s:version' % quote(
+        leaderboards.suburb_region(suburb))
+
+
+def suburb_version(suburb):
+    """
+    Returns the current cache version of a suburb's leaderboards
+    """
+    return get_version(suburb_version_key(suburb))
+
+
+def bump_suburb_versions(suburbs):
+    """
+    Invalidates the ranks cached for the places of the suburbs
+    """
+    for key in {suburb_version_key(suburb) for suburb in suburbs}:
+        bump_version(key)
+
+
+def listing_version():
+    """
+    Returns the current cache version of the place listings
+    """
+    return get_version(LISTING_VERSION_KEY)
+
+
+def bump_listing_version():
+    bump_version(LISTING_VERSION_KEY)
+
+
+def similar_version():
+    """
+    Returns the current cache version of the similar places
+    """
+    return get_version(SIMILAR_VERSION_KEY)
+
+
+def bump_similar_version():
+    bump_version(SIMILAR_VERSION_KEY)
+
+
+def cached_place(place_id):
+    """
+    Returns the place with its scorecard, from the cache when current, and
+    the version it is current for, to key anything else cached with it
+    """
+    version = place_version(place_id)
+    key = 'places:place:%d:%d' % (place_id, version)
+    place = cache.get(key)
+    if place is None:
+        # From the primary, as a lagging replica could otherwise cache an old
+        # scorecard under the new version for the whole timeout
+        try:
+            place = Place.objects.using('default').select_related(
+                'scorecard').get(pk=place_id)
+        except Place.DoesNotExist:
+            raise Http404('No place found matching the query')
+        cache.set(key, place, TIMEOUT)
+    return place, version
+
+
+def cached_ranks(place):
+    """
+    Returns the suburb leaderboard ranks of a place, cached until a place in
+    its suburb changes
+    """
+    key = 'places:ranks:%d:%d' % (place.pk, suburb_version(place.suburb))
+    ranks = cache.get(key)
+    if ranks is None:
+        # From the primary, like cached_place()
+        ranks = leaderboards.ranks(place.pk, using='default')
+        cache.set(key, ranks, TIMEOUT)
+    return ranks
+
+
+def cached_similar(place_id):
+    """
+    Returns the similar places of a place, cached until they are rebuilt or
+    a place changes
+    """
+    key = 'places:similar:%d:%d' % (place_id, similar_version())
+    similar = cache.get(key)
+    if similar is None:
+        similar = similarity.similar(place_id, using='default')
+        cache.set(key, similar, TIMEOUT)
+    return similar
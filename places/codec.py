@@ -0,0 +1,114 @@
+"""
+Compact encoding of Feedback as a pair of bitmasks.
+
+Bit i of the positive mask is set when ATTRIBUTES[i] was rated good, bit i
+of the negative mask when it was rated poor. Unrated attributes set neither.
+"""
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ATTRIBUTES = (
+    'atmosphere',
+    'cleanliness',
+    'decor',
+    'drink',
+    'entertainment',
+    'food',
+    'quality',
+    'service',
+    'speed',
+    'value',
+)
+
+BITS = {attr: 1 << i for i, attr in enumerate(ATTRIBUTES)}
+
+
+def encode(values):
+    """
+    Returns the (positive, negative) masks of a mapping of attribute names
+    to True/False/None
+    """
+    positive = 0
+    negative = 0
+    for attr, bit in BITS.items():
+        value = values.get(attr)
+        if value is True:
+            positive |= bit
+        elif value is False:
+            negative |= bit
+    return (positive, negative)
+
+
+def decode(positive, negative):
+    """
+    Returns a dict of attribute names to True/False/None
+    """
+    values = {}
+    for attr, bit in BITS.items():
+        if positive & bit:
+            values[attr] = True
+        elif negative & bit:
+            values[attr] = False
+        else:
+            values[attr] = None
+    return values
+
+
+def names(mask):
+    """
+    Returns the attribute names set in a mask
+    """
+    return [attr for attr, bit in BITS.items() if mask & bit]
+
+
+def count(mask):
+    """
+    Returns the number of attributes set in a mask
+    """
+    return bin(mask).count('1')
+
+
+def tally(rows):
+    """
+    Scores an iterable of (key, positive, negative) rows, returns a dict of
+    key to {attribute: net score} holding only the attributes rated at least
+    once under that key
+    """
+    if numpy is not None:
+        return _tally_numpy(rows)
+    counts = {}
+    for key, positive, negative in rows:
+        scores = counts.setdefault(key, {})
+        for attr, bit in BITS.items():
+            if positive & bit:
+                scores[attr] = scores.get(attr, 0) + 1
+            elif negative & bit:
+                scores[attr] = scores.get(attr, 0) - 1
+    return counts
+
+
+def _tally_numpy(rows):
+    rows = list(rows)
+    if not rows:
+        return {}
+    keys, positive, negative = zip(*rows)
+    unique, index = numpy.unique(keys, return_inverse=True)
+    bits = numpy.array(list(BITS.values()), dtype=numpy.uint16)
+    good = (numpy.array(positive, dtype=numpy.uint16)[:, None] & bits) != 0
+    poor = (numpy.array(negative, dtype=numpy.uint16)[:, None] & bits) != 0
+    size = len(unique)
+    net = numpy.empty((size, len(ATTRIBUTES)), dtype=numpy.int64)
+    rated = numpy.empty((size, len(ATTRIBUTES)), dtype=numpy.int64)
+    for i in range(len(ATTRIBUTES)):
+        net[:, i] = numpy.bincount(index, weights=good[:, i].astype(int)
+            - poor[:, i], minlength=size)
+        rated[:, i] = numpy.bincount(index, weights=good[:, i] | poor[:, i],
+            minlength=size)
+    counts = {}
+    for key, key_net, key_rated in zip(unique.tolist(), net.tolist(),
+            rated.tolist()):
+        counts[key] = {attr: score for attr, score, n
+            in zip(ATTRIBUTES, key_net, key_rated) if n}
+    return counts
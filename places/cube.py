@@ -0,0 +1,281 @@
+"""
+In-memory cube of rating counts for regional analytics.
+
+The good and poor ratings of every review are counted in a NumPy array
+indexed by location (state, suburb and postcode of the place), month of
+the visit in local time, attribute and good/poor. Queries filter and sum
+the array, so rolling up or drilling down by any of the dimensions never
+touches the database.
+
+Each process keeps its own cube. It is built with one grouped query on the
+first query, then every CUBE_REFRESH_SECONDS it adds the reviews with
+higher ids than it has counted, and every CUBE_REBUILD_SECONDS it is built
+again, which also drops deleted reviews and picks up reviews committed out
+of id order. Refreshes and rebuilds run in a background thread and queries
+are answered from the current cube meanwhile, only the first query waits
+for the cube to be built. Needs numpy.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max
+from django.db.models.functions import TruncMonth
+
+from . import codec
+from .models import Feedback, Review
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+REFRESH_SECONDS = 60
+REBUILD_SECONDS = 60 * 60
+
+LOCATION_DIMENSIONS = ('state', 'suburb', 'postcode')
+DIMENSIONS = LOCATION_DIMENSIONS + ('attribute', 'month')
+
+
+def month_number(date):
+    return date.year * 12 + date.month - 1
+
+
+def month_name(number):
+    year, month = divmod(number, 12)
+    return '%04d-%02d' % (year, month + 1)
+
+
+def parse_month(value):
+    """
+    Returns the month number of a YYYY-MM string, or None if invalid
+    """
+    year, _, month = value.partition('-')
+    if not (year.isdigit() and month.isdigit() and 1 <= int(month) <= 12):
+        return None
+    return int(year) * 12 + int(month) - 1
+
+
+def grouped_counts(after, until):
+    """
+    Returns the number of reviews with ids in (after, until] per location,
+    month and pair of rating masks
+    """
+    return Review.objects.filter(pk__gt=after, pk__lte=until,
+        feedback__isnull=False).annotate(month=TruncMonth('visit_date')
+        ).values_list('place__state', 'place__suburb', 'place__postcode',
+        'month', 'feedback__positive', 'feedback__negative').annotate(
+        count=Count('pk')).order_by()
+
+
+class Cube:
+
+    def __init__(self):
+        self.locations = []
+        self.location_index = {}
+        self.first_month = 0
+        # Location x month x attribute x (good, poor)
+        self.counts = numpy.zeros((0, 0, len(codec.ATTRIBUTES), 2),
+            dtype=numpy.int32)
+        self.last_review = 0
+        self.built = self.refreshed = time.monotonic()
+
+    def copy(self):
+        cube = Cube()
+        cube.locations = list(self.locations)
+        cube.location_index = dict(self.location_index)
+        cube.first_month = self.first_month
+        cube.counts = self.counts.copy()
+        cube.last_review = self.last_review
+        cube.built = self.built
+        return cube
+
+    def count(self, until):
+        """
+        Adds the ratings of the reviews with ids up to until
+        """
+        rows = list(grouped_counts(self.last_review, until))
+        self.last_review = until
+        self.refreshed = time.monotonic()
+        if not rows:
+            return
+        locations = []
+        months = []
+        for state, suburb, postcode, month, positive, negative, n in rows:
+            location = (state, suburb, postcode)
+            if location not in self.location_index:
+                self.location_index[location] = len(self.locations)
+                self.locations.append(location)
+            locations.append(self.location_index[location])
+            months.append(month_number(month))
+
+        first, last = min(months), max(months)
+        if self.counts.size:
+            first = min(first, self.first_month)
+            last = max(last, self.first_month + self.counts.shape[1] - 1)
+        if (len(self.locations) != self.counts.shape[0]
+                or first != self.first_month
+                or last - first + 1 != self.counts.shape[1]):
+            # Grown for new locations or months
+            counts = numpy.zeros((len(self.locations), last - first + 1,
+                len(codec.ATTRIBUTES), 2), dtype=numpy.int32)
+            offset = self.first_month - first
+            counts[:self.counts.shape[0],
+                offset:offset + self.counts.shape[1]] = self.counts
+            self.counts = counts
+            self.first_month = first
+
+        bits = numpy.array(list(codec.BITS.values()))
+        # Positive and negative masks and number of reviews
+        masks = numpy.array([row[4:] for row in rows], dtype=numpy.int64)
+        index = (numpy.array(locations),
+            numpy.array(months) - self.first_month)
+        for sign in (0, 1):
+            rated = (masks[:, sign, None] & bits) != 0
+            numpy.add.at(self.counts[..., sign], index,
+                (rated * masks[:, 2, None]).astype(numpy.int32))
+
+    def months(self):
+        return range(self.first_month, self.first_month + self.counts.shape[1])
+
+    def query(self, group_by=(), state=None, suburb=None, postcode=None,
+            attributes=None, first=None, last=None, postcode_digits=4):
+        """
+        Returns a list of dicts of the group_by dimensions with the positive
+        and negative counts of the ratings matching the filters. postcode
+        filters by prefix, and postcodes are grouped by their first
+        postcode_digits digits
+        """
+        locations = [i for i, (place_state, place_suburb, place_postcode)
+            in enumerate(self.locations)
+            if (not state or place_state.upper() == state.upper())
+            and (not suburb or place_suburb.lower() == suburb.lower())
+            and (not postcode or place_postcode.startswith(postcode))]
+        months = [month for month in self.months()
+            if (first is None or month >= first)
+            and (last is None or month <= last)]
+        attribute_index = [i for i, attr in enumerate(codec.ATTRIBUTES)
+            if not attributes or attr in attributes]
+        if not locations or not months or not attribute_index:
+            return []
+
+        # Dimensions not grouped by are summed away first, so the slower
+        # grouping of locations works on few cells
+        cells = self.counts[:, months[0] - self.first_month:
+            months[-1] - self.first_month + 1]
+        if len(locations) < len(self.locations):
+            cells = cells[locations]
+        if len(attribute_index) < len(codec.ATTRIBUTES):
+            cells = cells[:, :, attribute_index]
+        if 'month' not in group_by:
+            cells = cells.sum(axis=1, keepdims=True, dtype=numpy.int64)
+            months = [None]
+        if 'attribute' not in group_by:
+            cells = cells.sum(axis=2, keepdims=True, dtype=numpy.int64)
+            attribute_index = [None]
+
+        location_dimensions = [d for d in LOCATION_DIMENSIONS
+            if d in group_by]
+        keys = []
+        for i in locations:
+            place_state, place_suburb, place_postcode = self.locations[i]
+            values = {'state': place_state, 'suburb': place_suburb,
+                'postcode': place_postcode[:postcode_digits]}
+            keys.append(tuple(values[d] for d in location_dimensions))
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        starts = [n for n, i in enumerate(order)
+            if n == 0 or keys[i] != keys[order[n - 1]]]
+        groups = [keys[order[n]] for n in starts]
+        grouped = numpy.add.reduceat(cells[order], starts, axis=0,
+            dtype=numpy.int64)
+
+        results = []
+        for (g, m, a), (positive, negative) in zip(
+                numpy.ndindex(grouped.shape[:3]),
+                grouped.reshape(-1, 2).tolist()):
+            if not positive and not negative:
+                continue
+            result = dict(zip(location_dimensions, groups[g]))
+            if months[m] is not None:
+                result['month'] = month_name(months[m])
+            if attribute_index[a] is not None:
+                result['attribute'] = codec.ATTRIBUTES[attribute_index[a]]
+            result['positive'] = positive
+            result['negative'] = negative
+            results.append(result)
+        return results
+
+
+def last_review():
+    # Reviews get their feedback just after being saved, so this leaves out
+    # at most the few being posted, until the next rebuild
+    return Feedback.objects.aggregate(last=Max('review'))['last'] or 0
+
+
+def build():
+    cube = Cube()
+    cube.count(last_review())
+    return cube
+
+
+_cube = None
+# Held while the cube is built or refreshed
+_lock = threading.Lock()
+
+
+def refresh():
+    """
+    Refreshes or rebuilds the cube when due, waiting for a refresh already
+    running in another thread, and returns it
+    """
+    with _lock:
+        return _update()
+
+
+def _update():
+    global _cube
+    cube = _cube
+    now = time.monotonic()
+    refresh_seconds = getattr(settings, 'CUBE_REFRESH_SECONDS',
+        REFRESH_SECONDS)
+    rebuild_seconds = getattr(settings, 'CUBE_REBUILD_SECONDS',
+        REBUILD_SECONDS)
+    if cube is None or now - cube.built >= rebuild_seconds:
+        cube = build()
+    elif now - cube.refreshed >= refresh_seconds:
+        cube = cube.copy()
+        cube.count(last_review())
+    _cube = cube
+    return cube
+
+
+def _refresh_in_background():
+    # Started with _lock held by get_cube()
+    try:
+        _update()
+    finally:
+        connection.close()
+        _lock.release()
+
+
+def get_cube():
+    """
+    Returns the cube, starting a refresh or rebuild in another thread when
+    due
+    """
+    cube = _cube
+    if cube is None:
+        # Only the first query waits for the cube
+        return refresh()
+    refresh_seconds = getattr(settings, 'CUBE_REFRESH_SECONDS',
+        REFRESH_SECONDS)
+    if (time.monotonic() - cube.refreshed >= refresh_seconds
+            and _lock.acquire(blocking=False)):
+        threading.Thread(target=_refresh_in_background, daemon=True).start()
+    return cube
+
+
+def clear():
+    global _cube
+    _cube = None
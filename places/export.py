@@ -0,0 +1,239 @@
+"""
+Streaming export of reviews, with their feedback and place, for analytics.
+
+Rows are read in visit_date order through a server side cursor (on
+PostgreSQL) a chunk at a time and written as they arrive, so memory use
+does not grow with the number of reviews. Feedback is exported as its
+positive and negative masks, see places.codec.
+
+Formats:
+- npy: a directory with one .npy file per column, loadable with
+  numpy.load(mmap_mode='r'), and places.npy holding the suburb, state and
+  postcode of every place, to join on the place column
+- parquet: one file with a row group per chunk, needs pyarrow
+- csv: one file, with visit_date in ISO format
+
+Incremental exports take the reviews visited after a watermark, up to
+SETTLE seconds ago, and return the new watermark. Reviews are written
+within a request of their visit_date, so later exports miss none of them,
+except those imported afterwards with older visit dates.
+"""
+import csv
+import datetime
+import json
+import os
+
+from django.utils import timezone
+
+from .models import Place, Review
+from .timestamps import micros
+
+try:
+    import numpy
+    from numpy.lib import format as npy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+SETTLE = 60
+
+COLUMNS = ('review', 'place', 'reviewer', 'visit_date', 'positive',
+    'negative', 'suburb', 'state', 'postcode')
+
+# Place columns, only in places.npy in the npy format
+PLACE_COLUMNS = ('suburb', 'state', 'postcode')
+
+# Reviews without a reviewer have reviewer -1 in the npy format
+NPY_DTYPES = {
+    'review': '<i8',
+    'place': '<i8',
+    'reviewer': '<i8',
+    'visit_date': '<i8',
+    'positive': '<u2',
+    'negative': '<u2',
+}
+
+
+def formats():
+    """
+    Returns the formats available with the installed packages
+    """
+    available = ['csv']
+    if numpy is not None:
+        available.insert(0, 'npy')
+    if pyarrow is not None:
+        available.insert(0, 'parquet')
+    return available
+
+
+def chunks(since=None, until=None, chunk_size=10000):
+    """
+    Yields lists of up to chunk_size rows of COLUMNS, of the reviews
+    visited after since and up to until, in visit_date order
+    """
+    reviews = Review.objects.order_by('visit_date', 'pk')
+    if since is not None:
+        reviews = reviews.filter(visit_date__gt=since)
+    if until is not None:
+        reviews = reviews.filter(visit_date__lte=until)
+    rows = reviews.values_list('pk', 'place_id', 'reviewer_id', 'visit_date',
+        'feedback__positive', 'feedback__negative', 'place__suburb',
+        'place__state', 'place__postcode').iterator(chunk_size=chunk_size)
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class NpyWriter:
+    """
+    Appends each column to its .npy file, the headers are rewritten with
+    the final lengths on close
+    """
+
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.count = 0
+        self.files = {}
+        for column, dtype in NPY_DTYPES.items():
+            f = open(os.path.join(path, column + '.npy'), 'wb')
+            self.header_size = self.write_header(f, column, 0)
+            self.files[column] = f
+
+    def write_header(self, f, column, length):
+        """
+        Writes the header of a column file, returns its size
+        """
+        f.seek(0)
+        npy.write_array_header_1_0(f, {
+            'descr': npy.dtype_to_descr(numpy.dtype(NPY_DTYPES[column])),
+            'fortran_order': False,
+            'shape': (length,),
+        })
+        return f.tell()
+
+    def write(self, chunk):
+        review, place, reviewer, visit_date, positive, negative = list(
+            zip(*chunk))[:6]
+        columns = {
+            'review': review,
+            'place': place,
+            'reviewer': [-1 if pk is None else pk for pk in reviewer],
+            'visit_date': [micros(value) for value in visit_date],
+            'positive': [mask or 0 for mask in positive],
+            'negative': [mask or 0 for mask in negative],
+        }
+        for column, values in columns.items():
+            self.files[column].write(numpy.array(values,
+                dtype=NPY_DTYPES[column]).tobytes())
+        self.count += len(chunk)
+
+    def close(self):
+        for column, f in self.files.items():
+            # numpy pads headers so that any length fits in place
+            if self.write_header(f, column, self.count) != self.header_size:
+                raise ValueError('Header of %s.npy changed size' % column)
+            f.close()
+        places = list(Place.objects.order_by('pk').values_list(
+            'pk', *PLACE_COLUMNS))
+        numpy.save(os.path.join(self.path, 'places.npy'), numpy.array(places,
+            dtype=[('place', '<i8'), ('suburb', 'U50'), ('state', 'U3'),
+                ('postcode', 'U4')]))
+
+
+class ParquetWriter:
+
+    def __init__(self, path):
+        self.schema = pyarrow.schema([
+            ('review', pyarrow.int64()),
+            ('place', pyarrow.int64()),
+            ('reviewer', pyarrow.int64()),
+            ('visit_date', pyarrow.timestamp('us', tz='UTC')),
+            ('positive', pyarrow.uint16()),
+            ('negative', pyarrow.uint16()),
+            ('suburb', pyarrow.dictionary(pyarrow.int32(), pyarrow.string())),
+            ('state', pyarrow.dictionary(pyarrow.int8(), pyarrow.string())),
+            ('postcode', pyarrow.string()),
+        ])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema,
+            compression='zstd')
+
+    def write(self, chunk):
+        columns = [list(values) for values in zip(*chunk)]
+        # Reviews without feedback have no masks
+        columns[4] = [mask or 0 for mask in columns[4]]
+        columns[5] = [mask or 0 for mask in columns[5]]
+        self.writer.write_table(pyarrow.table(dict(zip(COLUMNS, columns)),
+            schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class CsvWriter:
+
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, chunk):
+        self.writer.writerows((review, place, reviewer, visit_date.isoformat(),
+            positive or 0, negative or 0, suburb, state, postcode)
+            for review, place, reviewer, visit_date, positive, negative,
+                suburb, state, postcode in chunk)
+
+    def close(self):
+        self.file.close()
+
+
+WRITERS = {
+    'npy': NpyWriter,
+    'parquet': ParquetWriter,
+    'csv': CsvWriter,
+}
+
+
+def export(path, fmt, since=None, chunk_size=10000):
+    """
+    Writes the reviews visited after since to path, returns the number of
+    reviews written and the watermark of the next incremental export
+    """
+    until = timezone.now() - datetime.timedelta(seconds=SETTLE)
+    if since is not None and since >= until:
+        until = since
+    writer = WRITERS[fmt](path)
+    count = 0
+    try:
+        for chunk in chunks(since, until, chunk_size):
+            writer.write(chunk)
+            count += len(chunk)
+    finally:
+        writer.close()
+    return count, until
+
+
+def write_watermark(path, watermark):
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'visit_date': watermark.isoformat()}, f)
+    os.replace(path + '.tmp', path)
+
+
+def read_watermark(path):
+    """
+    Returns the watermark saved at path, or None if there is none
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return datetime.datetime.fromisoformat(json.load(f)['visit_date'])
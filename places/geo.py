@@ -0,0 +1,97 @@
+"""
+Nearby places on a plain latitude/longitude grid, without PostGIS.
+
+The globe is cut into CELL_DEGREES square cells numbered row by row, and
+every place stores the number of its cell in an indexed integer column. The
+cells of one grid row are consecutive numbers, so the cells overlapping a
+bounding box are one integer range per row, which any database answers from
+the index. Candidates from those ranges are then ranked by their exact
+haversine distance in Python. Longitudes are not wrapped at the
+antimeridian.
+"""
+import math
+
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+
+# About 1.1km north-south, small enough that a dense city block reads a few
+# hundred candidates at most
+CELL_DEGREES = 0.01
+ROWS = round(180 / CELL_DEGREES)
+COLUMNS = round(360 / CELL_DEGREES)
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def row_column(latitude, longitude):
+    row = int((latitude + 90) // CELL_DEGREES)
+    column = int((longitude + 180) // CELL_DEGREES)
+    return min(max(row, 0), ROWS - 1), min(max(column, 0), COLUMNS - 1)
+
+
+def cell(latitude, longitude):
+    """
+    Returns the number of the grid cell containing a point
+    """
+    row, column = row_column(latitude, longitude)
+    return row * COLUMNS + column
+
+
+def distance(lat1, lon1, lat2, lon2):
+    """
+    Returns the great-circle distance between two points in kilometres
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2)
+        * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def cells_filter(latitude, longitude, km):
+    """
+    Returns a filter on Place.cell matching the cells of every point within
+    km of the given one
+    """
+    lat_delta = km / KM_PER_DEGREE
+    # Widest at the edge of the box nearest to a pole
+    edge = min(abs(latitude) + lat_delta, 89.9)
+    lon_delta = min(km / (KM_PER_DEGREE * math.cos(math.radians(edge))), 180)
+    first_row, first_column = row_column(latitude - lat_delta,
+        longitude - lon_delta)
+    last_row, last_column = row_column(latitude + lat_delta,
+        longitude + lon_delta)
+    query = Q()
+    for row in range(first_row, last_row + 1):
+        query |= Q(cell__range=(row * COLUMNS + first_column,
+            row * COLUMNS + last_column))
+    return query
+
+
+def within(queryset, latitude, longitude, km):
+    """
+    Returns (distance, place) pairs for the places of queryset within km of
+    a point, nearest first
+    """
+    places = queryset.filter(cells_filter(latitude, longitude, km))
+    found = []
+    for place in places:
+        d = distance(latitude, longitude, place.latitude, place.longitude)
+        if d <= km:
+            found.append((d, place))
+    found.sort(key=lambda pair: (pair[0], pair[1].pk))
+    return found
+
+
+def nearest(queryset, latitude, longitude, k=10, max_km=50):
+    """
+    Returns (distance, place) pairs for the k places of queryset nearest to
+    a point and no further than max_km away, nearest first
+    """
+    km = min(CELL_DEGREES * KM_PER_DEGREE, max_km)
+    while True:
+        # Everything within km is found, so the k nearest are exact
+        found = within(queryset, latitude, longitude, km)
+        if len(found) >= k or km >= max_km:
+            return found[:k]
+        km = min(km * 4, max_km)
@@ -0,0 +1,84 @@
+"""
+Materialized per-attribute leaderboards by suburb and state.
+
+Each attribute score of a place's scorecard is copied into one row listed
+under the place's suburb and one under its state, indexed so that the top
+places of a region come straight off the index. Rows are refreshed
+whenever a scorecard or a place changes.
+"""
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import LeaderboardEntry, Place
+
+
+def suburb_region(suburb):
+    return suburb.strip().lower()
+
+
+def state_region(state):
+    return state.strip().upper()
+
+
+def refresh(place_ids):
+    """
+    Rewrites the leaderboard rows of the given places
+    """
+    with transaction.atomic():
+        # Concurrent refreshes of a place would both delete its rows and
+        # then both insert them. The second one waits and reads the scores
+        # the first one wrote
+        Place.lock(place_ids)
+        entries = []
+        for pk, suburb, state, scores in Place.objects.filter(
+                pk__in=place_ids).values_list('pk', 'suburb', 'state',
+                'scorecard__scores'):
+            for attr, score in (scores or {}).items():
+                entries.append(LeaderboardEntry(place_id=pk, attribute=attr,
+                    region_type=LeaderboardEntry.SUBURB,
+                    region=suburb_region(suburb), score=score))
+                entries.append(LeaderboardEntry(place_id=pk, attribute=attr,
+                    region_type=LeaderboardEntry.STATE,
+                    region=state_region(state), score=score))
+        LeaderboardEntry.objects.filter(place__in=place_ids).delete()
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+
+def suburbs(place_ids):
+    """
+    Returns the suburbs the places are listed under
+    """
+    return set(LeaderboardEntry.objects.filter(place__in=place_ids,
+        region_type=LeaderboardEntry.SUBURB).values_list('region', flat=True))
+
+
+def top(attribute, suburb=None, state=None, limit=10):
+    """
+    Returns the best scoring entries for an attribute in a suburb or a
+    state, with their places
+    """
+    if suburb:
+        region_type, region = LeaderboardEntry.SUBURB, suburb_region(suburb)
+    else:
+        region_type, region = LeaderboardEntry.STATE, state_region(state)
+    return list(LeaderboardEntry.objects.filter(attribute=attribute,
+        region_type=region_type, region=region).select_related('place'
+        ).order_by('-score', 'place')[:limit])
+
+
+def ranks(place_id, region_type=LeaderboardEntry.SUBURB, using=None):
+    """
+    Returns {attribute: rank} of a place in its suburb's (or state's)
+    leaderboards, for the attributes it scores above zero, read from the
+    using database or as routed
+    """
+    better = LeaderboardEntry.objects.filter(attribute=OuterRef('attribute'),
+        region_type=region_type, region=OuterRef('region'),
+        score__gt=OuterRef('score')).order_by().values('attribute').annotate(
+        count=Count('pk')).values('count')
+    entries = LeaderboardEntry.objects.using(using).filter(place=place_id,
+        region_type=region_type, score__gt=0).annotate(
+        better=Coalesce(Subquery(better), 0)).order_by('better', 'attribute')
+    return {entry.attribute: entry.better + 1 for entry in entries}
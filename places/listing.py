@@ -0,0 +1,31 @@
+"""
+Keyset pages of places by rank, for the front page and the JSON API.
+
+Places created since rank_places last ran have no rank yet and follow the
+ranked ones by id. A page continues after a cursor, the rank of the last
+place of the previous page or 'u' and its id when it is not ranked.
+"""
+from django.db.models import F, Q
+
+
+def by_rank(places):
+    return places.order_by(F('rank').asc(nulls_last=True), 'pk')
+
+
+def after(places, cursor):
+    """
+    Returns the places following a cursor, all of them if it is invalid
+    """
+    # isdecimal() only accepts digits int() parses, unlike isdigit()
+    if cursor.isdecimal():
+        return places.filter(Q(rank__gt=int(cursor)) | Q(rank=None))
+    if cursor[:1] == 'u' and cursor[1:].isdecimal():
+        return places.filter(rank=None, pk__gt=int(cursor[1:]))
+    return places
+
+
+def cursor(rank, pk):
+    """
+    Returns the cursor continuing after the place with a rank and id
+    """
+    return rank if rank is not None else 'u%d' % pk
@@ -0,0 +1,99 @@
+import datetime
+from io import StringIO
+import json
+import platform
+
+import django
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment)
+
+from places import benchmarks, synthetic
+from places.models import Scorecard
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks the review hot paths on a throwaway test database '
+        'of synthetic data and writes the results as JSON. With --baseline, '
+        'fails when a case got slower or runs more queries than before')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--places', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--reviews', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--concurrency', type=int, default=16,
+            help='Concurrent clients of the WSGI and ASGI throughput runs')
+        parser.add_argument('--requests', type=int, default=500,
+            help='Requests of each throughput run, 0 to skip them')
+        parser.add_argument('--output', help='Write the results to this file')
+        parser.add_argument('--baseline',
+            help='Results of an earlier run to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+            help='Allowed median slowdown against the baseline, as a fraction')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        databases = setup_databases(verbosity=0, interactive=False)
+        try:
+            place_ids = synthetic.generate(options['places'],
+                options['users'], options['reviews'], seed=options['seed'])
+            for i in range(0, len(place_ids), 500):
+                Scorecard.rebuild(place_ids[i:i + 500])
+            call_command('rank_places', stdout=StringIO())
+            user = User.objects.create_user('benchmark')
+            results = benchmarks.run(place_ids, user, options['repeat'])
+            throughput = None
+            if options['requests']:
+                throughput = benchmarks.throughput(place_ids,
+                    options['concurrency'], options['requests'])
+        finally:
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'date': datetime.datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'places': options['places'],
+                'users': options['users'],
+                'reviews': options['reviews'],
+                'seed': options['seed'],
+            },
+            'results': results,
+            'throughput': throughput,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)['results']
+            regressions = self.compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against %s:\n%s' % (
+                    options['baseline'], '\n'.join(regressions)))
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            before = baseline[name]
+            if result['median_ms'] > before['median_ms'] * (1 + tolerance):
+                regressions.append('%s: median %.2fms, was %.2fms' % (
+                    name, result['median_ms'], before['median_ms']))
+            if result['queries'] > before['queries']:
+                regressions.append('%s: %d queries, was %d' % (
+                    name, result['queries'], before['queries']))
+        return regressions
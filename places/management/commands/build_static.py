@@ -0,0 +1,57 @@
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+try:
+    import sass
+except ImportError:
+    sass = None
+
+try:
+    import rcssmin
+    import rjsmin
+except ImportError:
+    rcssmin = rjsmin = None
+
+
+class Command(BaseCommand):
+    help = ('Compiles SCSS, writes the STATIC_BUNDLES and collects the '
+        'static files under hashed names with compressed variants')
+
+    def handle(self, *args, **options):
+        if sass is None:
+            self.stdout.write('libsass is not installed, skipping SCSS')
+        else:
+            call_command('compilescss', stdout=self.stdout)
+
+        bundles_dir = os.path.join(settings.STATICFILES_DIRS[0], 'bundles')
+        os.makedirs(bundles_dir, exist_ok=True)
+        for bundle, sources in getattr(settings, 'STATIC_BUNDLES', {}).items():
+            parts = [self.read(source) for source in sources]
+            # A statement may end without a semicolon at the end of a file
+            separator = ';\n' if bundle.endswith('.js') else '\n'
+            with open(os.path.join(bundles_dir, bundle), 'w') as f:
+                f.write(separator.join(parts))
+            self.stdout.write('Bundled %d files into bundles/%s' % (
+                len(sources), bundle))
+
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.stdout.write(self.style.SUCCESS('Collected static files into %s'
+            % settings.STATIC_ROOT))
+
+    def read(self, source):
+        path = finders.find(source)
+        if path is None:
+            raise CommandError('Bundle source %s not found' % source)
+        with open(path) as f:
+            content = f.read()
+        if '.min.' in source:
+            return content
+        if source.endswith('.js') and rjsmin is not None:
+            return rjsmin.jsmin(content)
+        if source.endswith('.css') and rcssmin is not None:
+            return rcssmin.cssmin(content)
+        return content
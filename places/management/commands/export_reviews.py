@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from places import export
+
+
+class Command(BaseCommand):
+    help = ('Exports reviews with their feedback masks and places for '
+        'analytics, streaming them in visit_date order. With --watermark, '
+        'each run exports the reviews visited since the previous run')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output',
+            help='A directory for npy, else a file')
+        parser.add_argument('--format', choices=sorted(export.WRITERS),
+            help='Defaults to parquet with pyarrow, else npy with numpy, '
+                'else csv')
+        parser.add_argument('--since',
+            help='Only export reviews visited after this date')
+        parser.add_argument('--watermark',
+            help='File holding the visit_date the previous export reached, '
+                'read as --since and advanced after exporting')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or export.formats()[0]
+        if fmt not in export.formats():
+            raise CommandError('The %s format needs %s installed' % (
+                fmt, 'pyarrow' if fmt == 'parquet' else 'numpy'))
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError('Invalid --since %r' % options['since'])
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        elif options['watermark']:
+            since = export.read_watermark(options['watermark'])
+
+        start = time.monotonic()
+        count, watermark = export.export(options['output'], fmt, since,
+            options['chunk_size'])
+        if options['watermark']:
+            export.write_watermark(options['watermark'], watermark)
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            'Exported %d reviews as %s in %.1fs (%.0f rows/s), up to %s' % (
+                count, fmt, elapsed, count / max(elapsed, 1e-6),
+                watermark.isoformat())))
@@ -0,0 +1,187 @@
+import csv
+import itertools
+import json
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from places import codec, rollups
+from places.models import (ImportCheckpoint, Place, Review, Feedback,
+    Scorecard)
+
+# Accepted attribute values, as posted by the review form or as JSON
+RATINGS = {'good': True, 'poor': False, True: True, False: False,
+    'true': True, 'false': False, '': None, None: None}
+
+
+def parse_id(value):
+    """
+    Returns the id given as a JSON number or a string of digits, or None
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if not isinstance(value, str) or not value.isdigit():
+        return None
+    try:
+        # isdigit() also accepts digits int() does not, e.g. superscripts
+        return int(value)
+    except ValueError:
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Imports reviews from a JSONL or CSV file. Each row has a place '
+        'id, an optional reviewer username, a visit_date and the rated '
+        'attributes as good/poor or true/false. Progress is saved with '
+        'every chunk, so an interrupted import resumes where it stopped when '
+        'run again.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('file')
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+            help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--checkpoint',
+            help='Name of the saved progress, defaults to the absolute path '
+            'of FILE')
+        parser.add_argument('--restart', action='store_true',
+            help='Ignore the checkpoint and import from the first row')
+
+    def handle(self, *args, **options):
+        path = options['file']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.')
+        if fmt not in ('jsonl', 'csv'):
+            raise CommandError('Cannot tell the format of %s, use --format'
+                % path)
+        name = options['checkpoint'] or os.path.abspath(path)
+        if options['restart']:
+            ImportCheckpoint.objects.filter(name=name).delete()
+        checkpoint = ImportCheckpoint.objects.get_or_create(name=name)[0]
+        if checkpoint.rows:
+            self.stdout.write('Resuming after row %d' % checkpoint.rows)
+        places = set(checkpoint.places)
+
+        start = time.monotonic()
+        with open(path, newline='') as f:
+            if fmt == 'csv':
+                rows = csv.DictReader(f)
+            else:
+                rows = (self.parse_json(line) for line in f if line.strip())
+            rows = itertools.islice(rows, checkpoint.rows, None)
+            while True:
+                chunk = list(itertools.islice(rows, options['chunk_size']))
+                if not chunk:
+                    break
+                reviews, errors = self.validate(chunk, checkpoint.rows)
+                places.update(review.place_id for review, feedback in reviews)
+                checkpoint.rows += len(chunk)
+                checkpoint.imported += len(reviews)
+                checkpoint.invalid += len(errors)
+                checkpoint.places = sorted(places)
+                # Committed together, a resumed import starts after the
+                # last chunk written
+                with transaction.atomic():
+                    self.save(reviews)
+                    checkpoint.save()
+                for error in errors:
+                    self.stderr.write(error)
+                self.stdout.write('%d rows, %d imported, %.0f rows/s' % (
+                    checkpoint.rows, checkpoint.imported,
+                    len(chunk) / max(time.monotonic() - start, 1e-6)))
+                start = time.monotonic()
+
+        self.stdout.write('Recounting %d scorecards and rollups' % len(places))
+        place_ids = sorted(places)
+        for i in range(0, len(place_ids), 500):
+            Scorecard.rebuild(place_ids[i:i + 500])
+            rollups.rebuild(place_ids[i:i + 500])
+        checkpoint.delete()
+        self.stdout.write(self.style.SUCCESS('Imported %d reviews, skipped '
+            '%d invalid rows' % (checkpoint.imported, checkpoint.invalid)))
+
+    def validate(self, chunk, offset):
+        """
+        Returns the unsaved (review, feedback) pairs of the valid rows of a
+        chunk, and an error message for each invalid row
+        """
+        place_ids = set()
+        usernames = set()
+        chunk = [row if isinstance(row, dict) else None for row in chunk]
+        for row in chunk:
+            if row is None:
+                continue
+            if parse_id(row.get('place')) is not None:
+                place_ids.add(parse_id(row['place']))
+            if row.get('reviewer') and isinstance(row['reviewer'], str):
+                usernames.add(row['reviewer'])
+        place_ids = set(Place.objects.filter(pk__in=place_ids
+            ).values_list('pk', flat=True))
+        users = dict(User.objects.filter(username__in=usernames
+            ).values_list('username', 'pk'))
+
+        reviews = []
+        errors = []
+        for number, row in enumerate(chunk, start=offset + 1):
+            try:
+                reviews.append(self.parse(row, place_ids, users))
+            except ValueError as e:
+                errors.append('Row %d: %s' % (number, e))
+        return reviews, errors
+
+    def parse_json(self, line):
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def parse(self, row, place_ids, users):
+        if row is None:
+            raise ValueError('not a JSON object')
+        place = parse_id(row.get('place'))
+        if place not in place_ids:
+            raise ValueError('unknown place %r' % row.get('place'))
+        reviewer = row.get('reviewer') or None
+        if reviewer is not None and (not isinstance(reviewer, str)
+                or reviewer not in users):
+            raise ValueError('unknown reviewer %r' % reviewer)
+        visit_date = parse_datetime(str(row.get('visit_date', '')))
+        if visit_date is None:
+            raise ValueError('invalid visit_date %r' % row.get('visit_date'))
+        if timezone.is_naive(visit_date):
+            visit_date = timezone.make_aware(visit_date)
+
+        values = {}
+        for attr in codec.ATTRIBUTES:
+            value = row.get(attr)
+            if isinstance(value, str):
+                value = value.strip().lower()
+            # Lists and objects are not hashable, numbers equal True/False
+            if (not isinstance(value, (str, bool, type(None)))
+                    or value not in RATINGS):
+                raise ValueError('invalid %s rating %r' % (attr, row[attr]))
+            values[attr] = RATINGS[value]
+        positive, negative = codec.encode(values)
+        if codec.count(positive) + codec.count(negative) < Feedback.MIN_POINTS:
+            raise ValueError('minimum %d feedback points required'
+                % Feedback.MIN_POINTS)
+
+        review = Review(place_id=place, reviewer_id=users.get(reviewer),
+            visit_date=visit_date)
+        feedback = Feedback(positive=positive, negative=negative, **values)
+        return review, feedback
+
+    def save(self, reviews):
+        if connection.features.can_return_rows_from_bulk_insert:
+            Review.objects.bulk_create(review for review, feedback in reviews)
+        else:
+            for review, feedback in reviews:
+                review.save()
+        for review, feedback in reviews:
+            feedback.review = review
+        # bulk_create skips Feedback.save(), the masks are set by parse()
+        Feedback.objects.bulk_create(feedback for review, feedback in reviews)
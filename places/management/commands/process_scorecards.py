@@ -0,0 +1,14 @@
+from places import queue
+from places.tasks import WorkerCommand
+
+
+class Command(WorkerCommand):
+    help = ('Recounts the scorecards of places queued by new reviews. Runs '
+        'until stopped unless --once is given')
+    done = 'Recounted %d scorecards in %.2fs'
+
+    def process(self, limit):
+        return queue.process(limit)
+
+    def stats(self):
+        return queue.stats()
@@ -0,0 +1,24 @@
+from places import snapshots
+from places.tasks import WorkerCommand
+
+
+class Command(WorkerCommand):
+    help = ('Renders the page snapshots queued by changes to places and '
+        'scorecards. Runs until stopped unless --once is given')
+    done = 'Rendered %d snapshots in %.2fs'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--rebuild', action='store_true',
+            help='Queue every snapshot first, e.g. after a deploy')
+
+    def handle(self, *args, **options):
+        if options['rebuild'] and not options['stats']:
+            snapshots.ranking_changed(rebuild=True)
+        super().handle(*args, **options)
+
+    def process(self, limit):
+        return snapshots.process(limit)
+
+    def stats(self):
+        return snapshots.stats()
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from places import cache, codec, snapshots
+from places.models import Place, Scorecard
+
+
+class Command(BaseCommand):
+    help = ('Assigns every place its position in the top places list, by '
+        'net score or by the score of a single attribute')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attribute', choices=codec.ATTRIBUTES,
+            help='Rank by this attribute instead of the net score')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        attribute = options['attribute']
+        scores = {}
+        for place_id, place_scores in Scorecard.objects.values_list(
+                'place', 'scores').iterator():
+            if attribute:
+                scores[place_id] = place_scores.get(attribute, 0)
+            else:
+                scores[place_id] = sum(place_scores.values())
+
+        current = dict(Place.objects.values_list('pk', 'rank').iterator())
+        ordered = sorted(current, key=lambda pk: (-scores.get(pk, 0), pk))
+        now = timezone.now()
+        moved = [Place(pk=pk, rank=rank, updated=now)
+            for rank, pk in enumerate(ordered, start=1)
+            if current[pk] != rank]
+
+        # Swap in the new ranking at once so pages never mix two rankings
+        with transaction.atomic():
+            Place.objects.bulk_update(moved, ['rank', 'updated'],
+                batch_size=options['batch_size'])
+        # Cached places and API responses show their rank
+        for place in moved:
+            cache.bump_place_version(place.pk)
+        cache.bump_listing_version()
+        if moved:
+            snapshots.ranking_changed()
+
+        self.stdout.write(self.style.SUCCESS(
+            'Ranked %d places, %d moved, in %.1fs' % (
+                len(ordered), len(moved), time.monotonic() - start)))
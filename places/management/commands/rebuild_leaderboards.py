@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from places import leaderboards
+from places.models import Place
+
+
+class Command(BaseCommand):
+    help = 'Rewrites the per-attribute suburb and state leaderboards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        place_ids = list(Place.objects.order_by('pk').values_list(
+            'pk', flat=True))
+        size = options['batch_size']
+        count = 0
+        for i in range(0, len(place_ids), size):
+            count += leaderboards.refresh(place_ids[i:i + size])
+        self.stdout.write(self.style.SUCCESS(
+            'Wrote %d leaderboard entries for %d places in %.1fs' % (
+                count, len(place_ids), time.monotonic() - start)))
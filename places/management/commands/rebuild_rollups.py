@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from places import rollups
+from places.models import Place
+
+
+class Command(BaseCommand):
+    help = 'Recounts the daily, weekly and monthly rating rollups of places'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--places', nargs='+', type=int, metavar='ID',
+            help='Only rebuild these places')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        places = Place.objects.order_by('pk')
+        if options['places']:
+            places = places.filter(pk__in=options['places'])
+        place_ids = list(places.values_list('pk', flat=True))
+        size = options['batch_size']
+        count = 0
+        for i in range(0, len(place_ids), size):
+            count += rollups.rebuild(place_ids[i:i + size])
+        self.stdout.write(self.style.SUCCESS(
+            'Wrote %d rollups for %d places in %.1fs' % (
+                count, len(place_ids), time.monotonic() - start)))
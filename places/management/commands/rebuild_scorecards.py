@@ -0,0 +1,78 @@
+from concurrent.futures import ProcessPoolExecutor
+import datetime
+import os
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+
+from places.models import Place, Review, Scorecard
+
+
+def rebuild_batch(place_ids, dry_run):
+    """
+    Rebuilds one batch of scorecards, runs inside a worker process
+    """
+    try:
+        return Scorecard.rebuild(place_ids, dry_run=dry_run)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Recounts place scorecards from the most-current review of each '
+        'reviewer, in batches spread over a pool of processes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--places', nargs='+', type=int, metavar='ID',
+            help='Only rebuild these places')
+        parser.add_argument('--since', metavar='DATE',
+            help='Only rebuild places reviewed on or after this date')
+        parser.add_argument('--dry-run', action='store_true',
+            help='Count the scorecards that would change without saving')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+            help='Number of worker processes, 1 runs in this process')
+
+    def handle(self, *args, **options):
+        places = Place.objects.all()
+        if options['places']:
+            places = places.filter(pk__in=options['places'])
+        if options['since']:
+            places = places.filter(pk__in=Review.objects.filter(
+                visit_date__gte=self.parse_since(options['since'])
+                ).values('place'))
+        place_ids = list(places.order_by('pk').values_list('pk', flat=True))
+        size = options['batch_size']
+        batches = [place_ids[i:i + size] for i in range(0, len(place_ids), size)]
+
+        start = time.monotonic()
+        if options['workers'] > 1 and len(batches) > 1:
+            # Forked workers must open their own database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'],
+                    initializer=django.setup) as pool:
+                changed = sum(pool.map(rebuild_batch, batches,
+                    [options['dry_run']] * len(batches)))
+        else:
+            changed = sum(Scorecard.rebuild(batch, dry_run=options['dry_run'])
+                for batch in batches)
+
+        self.stdout.write(self.style.SUCCESS(
+            '%s %d of %d scorecards in %.1fs' % (
+                'Would change' if options['dry_run'] else 'Changed',
+                changed, len(place_ids), time.monotonic() - start)))
+
+    def parse_since(self, value):
+        since = parse_datetime(value)
+        if since is None:
+            date = parse_date(value)
+            if date is None:
+                raise CommandError('--since must be a date or datetime')
+            since = datetime.datetime.combine(date, datetime.time.min)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from places import cache, similarity, snapshots
+from places.models import SimilarPlace
+
+
+class Command(BaseCommand):
+    help = ('Finds the places with the most similar scorecards to every '
+        'place, anywhere or within its state or suburb, for the detail '
+        'pages. Run it periodically, e.g. nightly')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--within',
+            choices=[scope for scope, label in SimilarPlace.SCOPES],
+            help='Defaults to SIMILAR_PLACES_SCOPE')
+        parser.add_argument('--count', type=int,
+            default=similarity.SIMILAR_PLACES,
+            help='Similar places to keep per place')
+        parser.add_argument('--block-cells', type=int,
+            default=similarity.BLOCK_CELLS,
+            help='Similarities computed at once, bounds memory use')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if similarity.numpy is None:
+            raise CommandError('rebuild_similar_places needs numpy')
+        start = time.monotonic()
+        scope = options['within'] or similarity.scope()
+        places, written = similarity.rebuild(scope, options['count'],
+            options['block_cells'], options['batch_size'])
+        cache.bump_similar_version()
+        if scope == similarity.scope():
+            # Snapshotted detail pages list them
+            snapshots.ranking_changed(rebuild=True)
+        self.stdout.write(self.style.SUCCESS(
+            'Wrote %d similar places of %d places in %.1fs' % (
+                written, places, time.monotonic() - start)))
@@ -0,0 +1,29 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from places import rollups, synthetic
+from places.models import Scorecard
+
+
+class Command(BaseCommand):
+    help = ('Fills the database with synthetic places, users and reviews '
+        'for development and load testing')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--places', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--reviews', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--skew', type=float, default=1.1,
+            help='Zipf exponent of place and reviewer popularity')
+
+    def handle(self, *args, **options):
+        place_ids = synthetic.generate(options['places'], options['users'],
+            options['reviews'], seed=options['seed'], skew=options['skew'])
+        for i in range(0, len(place_ids), 500):
+            Scorecard.rebuild(place_ids[i:i + 500])
+            rollups.rebuild(place_ids[i:i + 500])
+        call_command('rank_places', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            'Created %(places)d places, %(users)d users and %(reviews)d '
+            'reviews' % options))
@@ -0,0 +1,27 @@
+# Generated by Django 3.1.14 on 2026-10-18 07:56
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0010_auto_20210124_1727'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='review',
+            name='visit_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Visit date and time'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['place', 'reviewer', '-visit_date'], name='review_place_reviewer_visit'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['visit_date'], name='review_visit_date'),
+        ),
+    ]
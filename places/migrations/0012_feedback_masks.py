@@ -0,0 +1,54 @@
+# Generated by Django 3.1.14 on 2026-10-18 07:57
+
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+# The bits as of this migration, places.codec may change after it
+BITS = {attr: 1 << i for i, attr in enumerate((
+    'atmosphere',
+    'cleanliness',
+    'decor',
+    'drink',
+    'entertainment',
+    'food',
+    'quality',
+    'service',
+    'speed',
+    'value',
+))}
+
+
+def encode_masks(apps, schema_editor):
+    """
+    Backfills the feedback bitmasks from the boolean attribute columns
+    """
+    Feedback = apps.get_model('places', 'Feedback')
+    positive = Value(0)
+    negative = Value(0)
+    for attr, bit in BITS.items():
+        positive = positive + Case(When(**{attr: True}, then=Value(bit)),
+            default=Value(0))
+        negative = negative + Case(When(**{attr: False}, then=Value(bit)),
+            default=Value(0))
+    Feedback.objects.update(positive=positive, negative=negative)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0011_review_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedback',
+            name='negative',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='positive',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(encode_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0012_feedback_masks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='rank',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
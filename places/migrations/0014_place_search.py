@@ -0,0 +1,45 @@
+# Generated by Django 3.1.14 on 2026-10-18 07:59
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+# Expressions match the SQL Django generates for the lookups in places.search
+SEARCH_INDEXES = {
+    'place_name_trgm': 'USING gin (name gin_trgm_ops)',
+    'place_suburb_trgm': 'USING gin (suburb gin_trgm_ops)',
+    'place_name_upper_trgm': 'USING gin (UPPER(name::text) gin_trgm_ops)',
+    'place_suburb_upper_trgm': 'USING gin (UPPER(suburb::text) gin_trgm_ops)',
+    'place_postcode_prefix': '((postcode::text) text_pattern_ops)',
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, definition in SEARCH_INDEXES.items():
+        schema_editor.execute(
+            'CREATE INDEX %s ON places_place %s' % (name, definition))
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in SEARCH_INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS %s' % name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0013_place_rank'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='place',
+            index=models.Index(fields=['state', 'rank'], name='place_state_rank'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
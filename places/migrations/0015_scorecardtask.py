@@ -0,0 +1,22 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0014_place_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScorecardTask',
+            fields=[
+                ('place', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='places.place')),
+                ('requested', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0015_scorecardtask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scorecard',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
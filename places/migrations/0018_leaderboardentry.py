@@ -0,0 +1,33 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0017_scorerollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attribute', models.CharField(max_length=20)),
+                ('region_type', models.CharField(choices=[('suburb', 'Suburb'), ('state', 'State')], max_length=6)),
+                ('region', models.CharField(max_length=50)),
+                ('score', models.IntegerField()),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='places.place')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['attribute', 'region_type', 'region', '-score', 'place'], name='leaderboard_top'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardentry',
+            constraint=models.UniqueConstraint(fields=('place', 'attribute', 'region_type'), name='unique_leaderboard_entry'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0018_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='cell',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
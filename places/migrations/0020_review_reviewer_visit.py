@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0019_place_location'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['reviewer', '-visit_date', '-id'], name='review_reviewer_visit'),
+        ),
+    ]
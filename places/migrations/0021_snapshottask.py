@@ -0,0 +1,21 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:23
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0020_review_reviewer_visit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotTask',
+            fields=[
+                ('path', models.CharField(max_length=200, primary_key=True, serialize=False)),
+                ('requested', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
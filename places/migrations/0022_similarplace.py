@@ -0,0 +1,29 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0021_snapshottask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarPlace',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('all', 'Anywhere'), ('state', 'State'), ('suburb', 'Suburb')], max_length=6)),
+                ('position', models.PositiveSmallIntegerField()),
+                ('similarity', models.FloatField()),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_places', to='places.place')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='places.place')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='similarplace',
+            constraint=models.UniqueConstraint(fields=('place', 'scope', 'position'), name='unique_similar_place'),
+        ),
+    ]
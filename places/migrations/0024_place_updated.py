@@ -0,0 +1,20 @@
+# Generated by Django 3.1.14 on 2026-10-18 10:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0023_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -1,38 +1,99 @@
 import datetime
 
-from django.db import models
-from django.db.models import Q
+from django.db import connection, models, transaction
+from django.db.models import OuterRef, Q, Subquery
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import User
 from django.contrib.postgres.fields import ArrayField
 from django.core.exceptions import ValidationError
 
+from . import codec, geo
+from .signals import send_on_commit
+
 class Place(models.Model):
     name = models.CharField(max_length=100)
     street_address = models.CharField(max_length=100)
     suburb = models.CharField(max_length=50)
     state = models.CharField(max_length=3)
     postcode = models.CharField(max_length=4)
+    # Position in the top places list, assigned by the rank_places command
+    rank = models.PositiveIntegerField(null=True, blank=True, db_index=True,
+        editable=False)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Grid cell of the coordinates for nearby lookups, see places.geo
+    cell = models.IntegerField(null=True, blank=True, db_index=True,
+        editable=False)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'rank'], name='place_state_rank'),
+        ]
 
     def __str__(self):
         return self.name + ', ' + self.suburb
 
+    def clean(self):
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValidationError(
+                _('Enter both a latitude and a longitude, or neither.'))
+        if self.latitude is not None and not -90 <= self.latitude <= 90:
+            raise ValidationError(
+                {'latitude': _('Must be between -90 and 90.')})
+        if self.longitude is not None and not -180 <= self.longitude <= 180:
+            raise ValidationError(
+                {'longitude': _('Must be between -180 and 180.')})
+
+    def save(self, *args, **kwargs):
+        self.cell = self.get_cell()
+        super().save(*args, **kwargs)
+
+    def get_cell(self):
+        if self.latitude is None or self.longitude is None:
+            return None
+        return geo.cell(self.latitude, self.longitude)
+
+    @staticmethod
+    def lock(place_ids):
+        """
+        Locks the rows of the places until the commit, in id order so that
+        transactions locking several places cannot deadlock
+        """
+        list(Place.objects.select_for_update().filter(pk__in=place_ids
+            ).order_by('pk').values_list('pk'))
+
 class Review(models.Model):
     """
     Stores a feedback for a select few of defined place attributes
     """
     place = models.ForeignKey(Place, on_delete=models.CASCADE)
     reviewer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
-    visit_date = models.DateTimeField('Visit date and time', default=timezone.now())
+    visit_date = models.DateTimeField('Visit date and time', default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # Most-current review per reviewer of a place
+            models.Index(fields=['place', 'reviewer', '-visit_date'],
+                name='review_place_reviewer_visit'),
+            models.Index(fields=['visit_date'], name='review_visit_date'),
+            # Review history of a reviewer, paged by (visit_date, id)
+            models.Index(fields=['reviewer', '-visit_date', '-id'],
+                name='review_reviewer_visit'),
+        ]
     def __str__(self):
-        return str(self.place) + ' for ' + str(self.visit_date) + ', by ' + str(self.reviewer.username)
+        # Imported reviews may have no reviewer
+        reviewer = self.reviewer.username if self.reviewer else 'anonymous'
+        return str(self.place) + ' for ' + str(self.visit_date) + ', by ' + reviewer
 
 
 
 class Feedback(models.Model):
 
+    # Fewest rated attributes a review must have
+    MIN_POINTS = 3
+
     review = models.OneToOneField(Review, on_delete=models.CASCADE)
     atmosphere = models.BooleanField(null=True)
     cleanliness = models.BooleanField(null=True)
@@ -45,53 +106,55 @@ class Feedback(models.Model):
     speed = models.BooleanField(null=True)
     value = models.BooleanField(null=True)
 
+    # Bitmasks of the good and poor rated attributes, see places.codec
+    positive = models.PositiveSmallIntegerField(default=0)
+    negative = models.PositiveSmallIntegerField(default=0)
+
     def __str__(self):
         """
         Prints the rated attributes.
         """
-        pos = ''
-        neg = ''
-        for field in self.get_field_names():
-            if getattr(self, field) == True:
-                pos += field + ','
-            elif getattr(self, field) == False:
-                neg += field + ','
+        positive, negative = self.get_masks()
+        pos = ''.join(attr + ',' for attr in codec.names(positive))
+        neg = ''.join(attr + ',' for attr in codec.names(negative))
         return 'pos[' + pos + '], neg[' + neg + ']'
 
+    def save(self, *args, **kwargs):
+        self.positive, self.negative = self.get_masks()
+        super().save(*args, **kwargs)
+
+    def get_masks(self):
+        """
+        Returns the (positive, negative) bitmasks of the rated attributes
+        """
+        return codec.encode(vars(self))
+
     def get_feedback(self, value):
         """
         Returns feedbacks matching value(True/ False)
         """
-        ret = []
-        for field in self.get_field_names():
-            if getattr(self, field) == value:
-                ret.append(field)
-        return ret
+        positive, negative = self.get_masks()
+        return codec.names(positive if value else negative)
 
+    def get_good(self):
+        return self.get_feedback(True)
 
+    def get_poor(self):
+        return self.get_feedback(False)
+
+    @classmethod
     def get_field_names(cls):
         """
         Helper function to return names of rated attributes
         """
-        names = []
-        for field in Feedback._meta.fields:
-            if field.name != "id" and field.name != 'review':
-                names.append(field.name)
-        return names
+        return list(codec.ATTRIBUTES)
 
     def get_counts(self):
         """
         Returns the (True, False) counts as tuple
         """
-        pos = 0
-        neg = 0
-        for field in Feedback._meta.fields:
-            if field.name != "id" and field.name != 'review':
-                if field.value_from_object(self) is True:
-                    pos += 1
-                elif field.value_from_object(self) is False:
-                    neg += 1
-        return (pos, neg)
+        positive, negative = self.get_masks()
+        return (codec.count(positive), codec.count(negative))
 
 class Scorecard(models.Model):
     """
@@ -103,28 +166,264 @@ class Scorecard(models.Model):
         primary_key=True,
     )
     scores = models.JSONField(default=dict)
+    updated = models.DateTimeField(auto_now=True, db_index=True)
+
+    @staticmethod
+    def compute_scores(place_ids):
+        """
+        Counts the ratings of the most-current review of each reviewer for
+        many places at once, returns a dict of place id to scores
+        """
+        return codec.tally(current_feedback(place_ids).values_list(
+            'review__place', 'positive', 'negative'))
+
+    @staticmethod
+    def rebuild(place_ids, dry_run=False):
+        """
+        Recounts the scorecards of many places at once, returns the number
+        of scorecards that changed
+        """
+        with transaction.atomic():
+            # Locked before counting, reviews applied by add_review() while
+            # waiting are counted, later ones wait for the new scores
+            existing = {scorecard.place_id: scorecard for scorecard in
+                Scorecard.objects.select_for_update().filter(
+                    place__in=place_ids).order_by('place')}
+            counts = Scorecard.compute_scores(place_ids)
+            changed = []
+            created = []
+            now = timezone.now()
+            for place_id in place_ids:
+                scores = counts.get(place_id, {})
+                if place_id in existing:
+                    if existing[place_id].scores != scores:
+                        existing[place_id].scores = scores
+                        existing[place_id].updated = now
+                        changed.append(existing[place_id])
+                elif scores:
+                    created.append(Scorecard(place_id=place_id, scores=scores))
+            if not dry_run:
+                Scorecard.objects.bulk_update(changed, ['scores', 'updated'])
+                # A place's first review may have just created its
+                # scorecard, counting every review before it
+                Scorecard.objects.bulk_create(created, ignore_conflicts=True)
+                place_ids = [s.place_id for s in changed + created]
+                send_on_commit(Scorecard, place_ids)
+        return len(changed) + len(created)
+
+    def apply(self, review):
+        """
+        Applies a new review to the scores without saving them, for
+        add_review() which holds the scorecard row locked
+        """
+        previous = Review.objects.filter(
+            place=self.place_id, reviewer=review.reviewer_id
+            ).exclude(pk=review.pk).select_related('feedback'
+            ).order_by('-visit_date', '-pk').first()
+        replaced = []
+        if previous is not None:
+            if previous.visit_date > review.visit_date:
+                # An even newer review from this reviewer still counts
+                return
+            if hasattr(previous, 'feedback'):
+                self.tally(previous.feedback, -1)
+                replaced = (previous.feedback.get_good()
+                    + previous.feedback.get_poor())
+        self.tally(review.feedback, 1)
+        rated = review.feedback.get_good() + review.feedback.get_poor()
+        if any(self.scores.get(attr) == 0 for attr in replaced
+                if attr not in rated):
+            # A recount only keeps attributes some current review rates,
+            # which a net score of 0 cannot tell
+            self.scores = Scorecard.compute_scores([self.place_id]).get(
+                self.place_id, {})
+
+    @staticmethod
+    def add_review(review, feedback):
+        """
+        Saves a new review with its feedback and applies it to its place's
+        scorecard in one transaction. The scorecard row stays locked until
+        the commit, so concurrent reviews of a place are applied one after
+        another, each to the scores the previous one wrote
+        """
+        with transaction.atomic():
+            scorecard, created = Scorecard.objects.select_for_update(
+                ).get_or_create(place_id=review.place_id)
+            review.save()
+            feedback.review = review
+            feedback.save()
+            if created:
+                # Scores may predate the scorecard, count them all once
+                scorecard.scores = Scorecard.compute_scores(
+                    [review.place_id]).get(review.place_id, {})
+            else:
+                scorecard.apply(review)
+            scorecard.updated = timezone.now()
+            Scorecard.objects.filter(pk=scorecard.pk).update(
+                scores=scorecard.scores, updated=scorecard.updated)
+            # Readers caching the scores before the commit would keep the
+            # old ones under the new cache version
+            send_on_commit(Scorecard, [review.place_id])
+        return scorecard
+
+    def tally(self, feedback, sign=1):
+        """
+        Adds (sign=1) or removes (sign=-1) a feedback from the scores
+        """
+        positive, negative = feedback.get_masks()
+        for attr in codec.names(positive):
+            self.scores[attr] = self.scores.get(attr, 0) + sign
+        for attr in codec.names(negative):
+            self.scores[attr] = self.scores.get(attr, 0) - sign
+
+
+def current_feedback(place_ids):
+    """
+    Returns the feedback of each reviewer's most-current review for the
+    given places, as a single query
+    """
+    feedback = Feedback.objects.filter(review__place__in=place_ids)
+    if connection.features.can_distinct_on_fields:
+        return feedback.order_by('review__place', 'review__reviewer',
+            '-review__visit_date', '-review__pk').distinct(
+            'review__place', 'review__reviewer')
+    def latest(**reviewer):
+        return Subquery(Review.objects.filter(
+            place=OuterRef('review__place'), **reviewer
+            ).order_by('-visit_date', '-pk').values('pk')[:1])
+    # Like DISTINCT ON, reviews without a reviewer count as one reviewer
+    return feedback.filter(
+        Q(review__reviewer__isnull=False,
+            review=latest(reviewer=OuterRef('review__reviewer'))) |
+        Q(review__reviewer__isnull=True,
+            review=latest(reviewer__isnull=True)))
+
+
+class ScorecardTask(models.Model):
+    """
+    A pending recount of a place's scorecard, see places.queue
+    """
+    place = models.OneToOneField(
+        Place,
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    # When the oldest review still waiting to be counted was posted
+    requested = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+class SnapshotTask(models.Model):
+    """
+    A pending rendering of a page snapshot, see places.snapshots
+    """
+    # URL path of the page, e.g. /places/1/
+    path = models.CharField(max_length=200, primary_key=True)
+    # When the oldest change still waiting to be rendered was made
+    requested = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of an import_reviews run, saved in the transaction of each
+    chunk so that a resumed import never writes a chunk twice
+    """
+    # Absolute path of the imported file, or the --checkpoint name
+    name = models.CharField(max_length=255, primary_key=True)
+    rows = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    invalid = models.PositiveIntegerField(default=0)
+    # Places with imported reviews, recounted once every row is imported
+    places = models.JSONField(default=list)
+
+
+class ScoreRollup(models.Model):
+    """
+    Counts the good and poor ratings of one attribute of a place in one
+    day, week or month, see places.rollups
+    """
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+    PERIODS = [
+        (DAY, 'Day'),
+        (WEEK, 'Week'),
+        (MONTH, 'Month'),
+    ]
+
+    place = models.ForeignKey(Place, on_delete=models.CASCADE)
+    period = models.CharField(max_length=5, choices=PERIODS)
+    # First day of the period, weeks start on Monday
+    start = models.DateField()
+    attribute = models.CharField(max_length=20)
+    positive = models.PositiveIntegerField(default=0)
+    negative = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['place', 'period', 'start', 'attribute'],
+                name='unique_score_rollup'),
+        ]
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Score of one attribute of a place, ranked within its suburb or state,
+    see places.leaderboards
+    """
+    SUBURB = 'suburb'
+    STATE = 'state'
+    REGION_TYPES = [
+        (SUBURB, 'Suburb'),
+        (STATE, 'State'),
+    ]
+
+    place = models.ForeignKey(Place, on_delete=models.CASCADE)
+    attribute = models.CharField(max_length=20)
+    region_type = models.CharField(max_length=6, choices=REGION_TYPES)
+    # Lower case suburb or upper case state
+    region = models.CharField(max_length=50)
+    score = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['attribute', 'region_type', 'region', '-score', 'place'],
+                name='leaderboard_top'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['place', 'attribute', 'region_type'],
+                name='unique_leaderboard_entry'),
+        ]
+
+
+class SimilarPlace(models.Model):
+    """
+    One of the places with the most similar scorecards to a place, anywhere
+    or within its state or suburb, see places.similarity
+    """
+    ANYWHERE = 'all'
+    STATE = 'state'
+    SUBURB = 'suburb'
+    SCOPES = [
+        (ANYWHERE, 'Anywhere'),
+        (STATE, 'State'),
+        (SUBURB, 'Suburb'),
+    ]
+
+    place = models.ForeignKey(Place, on_delete=models.CASCADE,
+        related_name='similar_places')
+    similar = models.ForeignKey(Place, on_delete=models.CASCADE,
+        related_name='+')
+    scope = models.CharField(max_length=6, choices=SCOPES)
+    # 1 for the most similar place
+    position = models.PositiveSmallIntegerField()
+    # Cosine similarity of the scorecards, above 0
+    similarity = models.FloatField()
 
-    def count_scores(self):
-        """
-        Counts the ratings for all most-current reviews
-        """
-        # Get reviewers of this place
-        counts = {}
-        p = Q(place=self.place)
-        users = Review.objects.filter(p).distinct('reviewer').values('reviewer')
-        # Loops over users and gets most recent review
-        for u in users:
-            f = Review.objects.filter(p, reviewer=u['reviewer']
-                ).latest('visit_date').feedback
-            for attr in f.get_feedback(True):
-                if attr in counts:
-                    counts[attr] += 1
-                else:
-                    counts[attr] = 1
-            for attr in f.get_feedback(False):
-                if attr in counts:
-                    counts[attr] -= 1
-                else:
-                    counts[attr] = -1
-        self.scores = counts
-        self.save()
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['place', 'scope', 'position'],
+                name='unique_similar_place'),
+        ]
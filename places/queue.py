@@ -0,0 +1,44 @@
+"""
+Database-backed queue of scorecard recounts.
+
+Reviews only enqueue their place and the process_scorecards command
+recounts queued places in batches. A place has at most one pending task, so
+any number of reviews of a busy place waiting in the queue cost a single
+recount.
+"""
+from django.db import transaction
+
+from . import tasks
+from .models import Scorecard, ScorecardTask
+
+
+def enqueue(place_id):
+    """
+    Requests a recount of a place, coalescing with a pending request. Call
+    it in the transaction saving the review: the task stays locked until
+    the review is committed, so workers skip it rather than claim it and
+    recount without the review
+    """
+    with transaction.atomic():
+        ScorecardTask.objects.select_for_update().get_or_create(
+            place_id=place_id)
+
+
+def recount(claimed):
+    Scorecard.rebuild([task.place_id for task in claimed])
+
+
+def process(limit=100):
+    """
+    Recounts up to limit queued places, oldest first, returns the number
+    of places recounted
+    """
+    return tasks.process(ScorecardTask, recount, limit)
+
+
+def stats():
+    """
+    Returns the number of queued places and the age of the oldest request
+    in seconds
+    """
+    return tasks.stats(ScorecardTask)
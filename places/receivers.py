@@ -0,0 +1,62 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache, leaderboards, search, snapshots
+from .models import Place, Scorecard
+from .signals import scorecards_updated
+
+
+# Receivers run in the order they are connected, leaderboards are refreshed
+# before the cache versions are bumped so that cached ranks read them
+
+@receiver(post_save, sender=Place)
+def place_saved(sender, instance, created, **kwargs):
+    if not created:
+        # Suburb or state may have changed, moving the ranks of the places
+        # in the suburb it was listed under
+        listed = leaderboards.suburbs([instance.pk])
+        leaderboards.refresh([instance.pk])
+        transaction.on_commit(lambda: cache.bump_suburb_versions(listed))
+
+
+@receiver([post_save, post_delete], sender=Place)
+def place_changed(sender, instance, **kwargs):
+    # After the commit, as readers caching the place before it would keep
+    # the old one under the new versions. Deleting clears the pk
+    place_id, suburb = instance.pk, instance.suburb
+    transaction.on_commit(lambda: invalidate_place(place_id, suburb))
+
+
+def invalidate_place(place_id, suburb):
+    search.invalidate_index()
+    cache.bump_place_version(place_id)
+    cache.bump_suburb_versions([suburb])
+    # Similar places are listed with their names
+    cache.bump_similar_version()
+    cache.bump_listing_version()
+    snapshots.place_changed(place_id)
+
+
+@receiver([post_save, post_delete], sender=Scorecard)
+def scorecard_changed(sender, instance, **kwargs):
+    scorecards_updated.send(sender=Scorecard, place_ids=[instance.place_id])
+
+
+@receiver(scorecards_updated)
+def refresh_leaderboards(sender, place_ids, **kwargs):
+    leaderboards.refresh(place_ids)
+
+
+@receiver(scorecards_updated)
+def invalidate_places(sender, place_ids, **kwargs):
+    for place_id in place_ids:
+        cache.bump_place_version(place_id)
+    cache.bump_suburb_versions(Place.objects.filter(pk__in=place_ids
+        ).values_list('suburb', flat=True))
+    cache.bump_listing_version()
+
+
+@receiver(scorecards_updated)
+def invalidate_snapshots(sender, place_ids, **kwargs):
+    snapshots.scorecards_changed(place_ids)
@@ -0,0 +1,178 @@
+"""
+Time-bucketed rating counts for windowed scores and trends.
+
+Every review adds its ratings to the day, week and month containing its
+visit date, in the visit's local time. Unlike scorecards, rollups count
+every review rather than each reviewer's most-current one, so a window
+reads as "ratings given in the last N days". A window is summed from the
+fewest whole buckets covering it, e.g. a 90 day window reads about twenty
+rows per attribute.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from . import codec
+from .models import Place, Review, ScoreRollup
+
+PERIODS = (ScoreRollup.DAY, ScoreRollup.WEEK, ScoreRollup.MONTH)
+
+
+def bucket_start(date, period):
+    """
+    Returns the first day of the period containing date
+    """
+    if period == ScoreRollup.WEEK:
+        return date - datetime.timedelta(days=date.weekday())
+    if period == ScoreRollup.MONTH:
+        return date.replace(day=1)
+    return date
+
+
+def next_month(date):
+    return (date.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def cover(first, last):
+    """
+    Returns the fewest (period, start) buckets exactly covering the days
+    from first to last inclusive
+    """
+    buckets = []
+    day = first
+    while day <= last:
+        if day.day == 1 and next_month(day) <= last + datetime.timedelta(1):
+            buckets.append((ScoreRollup.MONTH, day))
+            day = next_month(day)
+        elif day.weekday() == 0 and day + datetime.timedelta(6) <= last:
+            buckets.append((ScoreRollup.WEEK, day))
+            day += datetime.timedelta(7)
+        else:
+            buckets.append((ScoreRollup.DAY, day))
+            day += datetime.timedelta(1)
+    return buckets
+
+
+def buckets_filter(buckets):
+    starts = {}
+    for period, start in buckets:
+        starts.setdefault(period, []).append(start)
+    query = Q()
+    for period, dates in starts.items():
+        query |= Q(period=period, start__in=dates)
+    return query
+
+
+def record(review, feedback):
+    """
+    Adds a new review's ratings to its place's rollups
+    """
+    positive, negative = feedback.get_masks()
+    if not positive and not negative:
+        return
+    date = timezone.localdate(review.visit_date)
+    buckets = [(period, bucket_start(date, period)) for period in PERIODS]
+    rollups = ScoreRollup.objects.filter(buckets_filter(buckets),
+        place=review.place_id)
+    with transaction.atomic():
+        # Takes turns with rebuild()
+        Place.lock([review.place_id])
+        ScoreRollup.objects.bulk_create([
+            ScoreRollup(place_id=review.place_id, period=period, start=start,
+                attribute=attr)
+            for period, start in buckets
+            for attr in codec.names(positive | negative)
+            ], ignore_conflicts=True)
+        if positive:
+            rollups.filter(attribute__in=codec.names(positive)).update(
+                positive=F('positive') + 1)
+        if negative:
+            rollups.filter(attribute__in=codec.names(negative)).update(
+                negative=F('negative') + 1)
+
+
+def rebuild(place_ids):
+    """
+    Recounts the rollups of the given places from their reviews
+    """
+    with transaction.atomic():
+        # Locked before counting, reviews recorded while waiting are
+        # counted, later ones are added to the new rollups
+        Place.lock(place_ids)
+        rollups = count_rollups(place_ids)
+        ScoreRollup.objects.filter(place__in=place_ids).delete()
+        ScoreRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def count_rollups(place_ids):
+    """
+    Returns the unsaved rollups of the given places counted from their
+    reviews
+    """
+    counts = {}
+    for attr in codec.ATTRIBUTES:
+        counts[attr + '_positive'] = Count('pk',
+            filter=Q(**{'feedback__' + attr: True}))
+        counts[attr + '_negative'] = Count('pk',
+            filter=Q(**{'feedback__' + attr: False}))
+    rollups = []
+    for period in PERIODS:
+        rows = Review.objects.filter(place__in=place_ids).annotate(
+            start=Trunc('visit_date', period)
+            ).values('place', 'start').annotate(**counts).order_by()
+        for row in rows:
+            # Truncated in the current time zone, like record()
+            start = timezone.localdate(row['start'])
+            for attr in codec.ATTRIBUTES:
+                positive = row[attr + '_positive']
+                negative = row[attr + '_negative']
+                if positive or negative:
+                    rollups.append(ScoreRollup(place_id=row['place'],
+                        period=period, start=start, attribute=attr,
+                        positive=positive, negative=negative))
+    return rollups
+
+
+def window(place_id, days, end=None):
+    """
+    Returns {attribute: {'positive', 'negative', 'net'}} for the ratings of
+    the days days up to and including end, today by default
+    """
+    end = end or timezone.localdate()
+    buckets = cover(end - datetime.timedelta(days=days - 1), end)
+    rows = ScoreRollup.objects.filter(buckets_filter(buckets),
+        place=place_id).values('attribute').annotate(
+        positive=Sum('positive'), negative=Sum('negative')).order_by()
+    return {row['attribute']: {
+        'positive': row['positive'],
+        'negative': row['negative'],
+        'net': row['positive'] - row['negative'],
+        } for row in rows}
+
+
+def trend(place_id, period=ScoreRollup.WEEK, count=12, end=None):
+    """
+    Returns the last count buckets of a period as a list of (start,
+    {attribute: (positive, negative)}) pairs, oldest first
+    """
+    start = bucket_start(end or timezone.localdate(), period)
+    starts = [start]
+    for i in range(count - 1):
+        if period == ScoreRollup.MONTH:
+            start = bucket_start(start - datetime.timedelta(days=1), period)
+        elif period == ScoreRollup.WEEK:
+            start -= datetime.timedelta(days=7)
+        else:
+            start -= datetime.timedelta(days=1)
+        starts.append(start)
+    series = {start: {} for start in reversed(starts)}
+    for row in ScoreRollup.objects.filter(place=place_id, period=period,
+            start__in=starts).values('start', 'attribute', 'positive',
+            'negative'):
+        series[row['start']][row['attribute']] = (
+            row['positive'], row['negative'])
+    return list(series.items())
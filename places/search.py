@@ -0,0 +1,133 @@
+"""
+Venue search by prefix and fuzzy matching on name, suburb and postcode.
+
+On PostgreSQL the matching runs in the database against the pg_trgm indexes
+created by migration 0014. Other backends (SQLite in tests and local
+development) use an in-process trigram index built from the place table and
+rebuilt after places change.
+"""
+import bisect
+import re
+import threading
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+from .models import Place
+
+STATES = ('ACT', 'NSW', 'NT', 'QLD', 'SA', 'TAS', 'VIC', 'WA')
+
+# Same default as pg_trgm.similarity_threshold
+SIMILARITY_THRESHOLD = 0.3
+
+
+def search_places(query, state=None, limit=50):
+    """
+    Returns up to limit places matching the query, best matches first
+    """
+    query = query.strip()
+    if not query:
+        return []
+    if connection.vendor == 'postgresql':
+        places = Place.objects.annotate(similarity=Greatest(
+            TrigramSimilarity('name', query),
+            TrigramSimilarity('suburb', query),
+            )).filter(
+            Q(name__istartswith=query) | Q(suburb__istartswith=query) |
+            Q(postcode__startswith=query) | Q(name__trigram_similar=query) |
+            Q(suburb__trigram_similar=query))
+        if state:
+            places = places.filter(state=state)
+        return list(places.order_by('-similarity', 'pk')[:limit])
+
+    matches = trigram_index().search(query, state)[:limit]
+    places = Place.objects.in_bulk([pk for pk, score in matches])
+    return [places[pk] for pk, score in matches if pk in places]
+
+
+def trigrams(text):
+    """
+    Returns the set of trigrams of each word of text, padded like pg_trgm
+    """
+    grams = set()
+    for word in re.findall(r'\w+', text.lower()):
+        word = '  ' + word + ' '
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class TrigramIndex:
+    """
+    In-memory search index of places, for backends without pg_trgm
+    """
+
+    def __init__(self, rows):
+        self.states = {}
+        self.grams = {}
+        self.postings = {}
+        self.prefixes = []
+        for pk, name, suburb, state, postcode in rows:
+            self.states[pk] = state
+            self.grams[pk] = (trigrams(name), trigrams(suburb))
+            for gram in self.grams[pk][0] | self.grams[pk][1]:
+                self.postings.setdefault(gram, set()).add(pk)
+            for key in (name.lower(), suburb.lower(), postcode):
+                self.prefixes.append((key, pk))
+        self.prefixes.sort()
+
+    def search(self, query, state=None):
+        """
+        Returns (place id, score) pairs, prefix matches scoring 1
+        """
+        scores = {}
+        query_lower = query.lower()
+        i = bisect.bisect_left(self.prefixes, (query_lower,))
+        while (i < len(self.prefixes)
+                and self.prefixes[i][0].startswith(query_lower)):
+            scores[self.prefixes[i][1]] = 1.0
+            i += 1
+
+        query_grams = trigrams(query)
+        candidates = set()
+        for gram in query_grams:
+            candidates |= self.postings.get(gram, set())
+        for pk in candidates - scores.keys():
+            score = max(similarity(query_grams, grams)
+                for grams in self.grams[pk])
+            if score >= SIMILARITY_THRESHOLD:
+                scores[pk] = score
+
+        if state:
+            scores = {pk: score for pk, score in scores.items()
+                if self.states[pk] == state}
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def trigram_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = TrigramIndex(Place.objects.values_list(
+                'pk', 'name', 'suburb', 'state', 'postcode').iterator())
+        return _index
+
+
+def invalidate_index(**kwargs):
+    """
+    Signal receiver dropping the in-process index after places change
+    """
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,25 @@
+import logging
+
+from django.db import transaction
+from django.dispatch import Signal
+
+logger = logging.getLogger(__name__)
+
+# Sent with place_ids whenever scorecards change, including bulk writes
+# that bypass Scorecard.save()
+scorecards_updated = Signal()
+
+
+def send_on_commit(sender, place_ids):
+    """
+    Sends scorecards_updated once the current transaction commits. The
+    scores are saved by then, so failing receivers are logged rather than
+    failing the request, whose retry would write them again
+    """
+    def send():
+        for receiver, result in scorecards_updated.send_robust(
+                sender=sender, place_ids=place_ids):
+            if isinstance(result, Exception):
+                logger.error('%s failed for places %s', receiver.__name__,
+                    place_ids, exc_info=result)
+    transaction.on_commit(send)
@@ -0,0 +1,146 @@
+"""
+Similar places, by the profile of their scorecards.
+
+A scorecard is a vector of net attribute scores, scaled to unit length so
+that places compare by which attributes they are rated for rather than by
+how many reviews they have, and the similarity of two places is the dot
+product of their vectors. rebuild() loads every scorecard into a matrix and
+stores each place's most similar places as SimilarPlace rows, comparing a
+block of rows against the others at a time so memory stays within about
+BLOCK_CELLS similarities. Needs numpy.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from . import codec, leaderboards
+from .models import SimilarPlace, Scorecard
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BLOCK_CELLS = 1 << 22
+
+SIMILAR_PLACES = 5
+
+
+def scope():
+    """
+    Returns the scope of the similar places shown on detail pages
+    """
+    return getattr(settings, 'SIMILAR_PLACES_SCOPE', SimilarPlace.STATE)
+
+
+def similar(place_id, using=None):
+    """
+    Returns the similar places of a place, most similar first, read from
+    the using database or as routed
+    """
+    return list(SimilarPlace.objects.using(using).filter(place=place_id,
+        scope=scope()).select_related('similar').order_by('position'))
+
+
+def region(scope, suburb, state):
+    if scope == SimilarPlace.SUBURB:
+        # Suburb names repeat across states
+        return '%s/%s' % (leaderboards.state_region(state),
+            leaderboards.suburb_region(suburb))
+    if scope == SimilarPlace.STATE:
+        return leaderboards.state_region(state)
+    return ''
+
+
+def load(scope):
+    """
+    Returns the place ids, unit scorecard vectors and region numbers of
+    every place with a scorecard, ordered by region
+    """
+    place_ids = []
+    vectors = []
+    regions = []
+    for place_id, scores, suburb, state in Scorecard.objects.order_by(
+            'place').values_list('place', 'scores', 'place__suburb',
+            'place__state').iterator():
+        place_ids.append(place_id)
+        vectors.append([scores.get(attr, 0) for attr in codec.ATTRIBUTES])
+        regions.append(region(scope, suburb, state))
+    place_ids = numpy.array(place_ids, dtype=numpy.int64)
+    vectors = numpy.array(vectors, dtype=numpy.float32).reshape(
+        -1, len(codec.ATTRIBUTES))
+    regions = numpy.unique(numpy.array(regions, dtype=str),
+        return_inverse=True)[1].reshape(-1).astype(numpy.int64)
+    norms = numpy.linalg.norm(vectors, axis=1)
+    # Places without any score are similar to none
+    vectors[norms > 0] /= norms[norms > 0, None]
+    order = numpy.argsort(regions, kind='stable')
+    return place_ids[order], vectors[order], regions[order]
+
+
+def nearest(vectors, k, block_rows):
+    """
+    Yields the start row, then the columns and similarities of the k most
+    similar other rows to each row, for each block of rows
+    """
+    size = len(vectors)
+    k = min(k, size - 1)
+    for start in range(0, size, block_rows):
+        similarities = vectors[start:start + block_rows] @ vectors.T
+        rows = numpy.arange(len(similarities))
+        similarities[rows, start + rows] = -numpy.inf
+        if k < size - 1:
+            columns = numpy.argpartition(similarities, -k, axis=1)[:, -k:]
+        else:
+            columns = numpy.broadcast_to(numpy.arange(size),
+                similarities.shape)
+        scores = numpy.take_along_axis(similarities, columns, axis=1)
+        # Most similar first, ties by place id
+        order = numpy.lexsort((columns, -scores))[:, :k]
+        yield (start, numpy.take_along_axis(columns, order, axis=1),
+            numpy.take_along_axis(scores, order, axis=1))
+
+
+def rebuild(scope=SimilarPlace.ANYWHERE, k=SIMILAR_PLACES, block_cells=None,
+        batch_size=1000):
+    """
+    Rewrites the similar places of every place within scope, in
+    transactions of batch_size places, returns the number of places
+    compared and the number of rows written
+    """
+    place_ids, vectors, regions = load(scope)
+    starts = numpy.flatnonzero(numpy.diff(regions, prepend=-1,
+        append=-1)).tolist()
+    batch = []
+    entries = []
+    written = 0
+    for start, end in zip(starts, starts[1:]):
+        # Each region is compared within itself
+        block_rows = max(1, (block_cells or BLOCK_CELLS) // (end - start))
+        region_ids = place_ids[start:end]
+        for row, columns, scores in nearest(vectors[start:end], k,
+                block_rows):
+            ids = region_ids[row:row + len(columns)].tolist()
+            for place_id, similar_ids, similarities in zip(ids,
+                    region_ids[columns].tolist(), scores.tolist()):
+                entries.extend(SimilarPlace(place_id=place_id,
+                        similar_id=similar_id, scope=scope,
+                        position=position, similarity=similarity)
+                    for position, (similar_id, similarity) in enumerate(
+                        zip(similar_ids, similarities), start=1)
+                    if similarity > 0)
+            batch.extend(ids)
+            if len(batch) >= batch_size:
+                written += write(scope, batch, entries)
+                batch, entries = [], []
+    written += write(scope, batch, entries)
+    # Places whose scorecards were removed
+    SimilarPlace.objects.filter(scope=scope,
+        place__scorecard__isnull=True).delete()
+    return len(place_ids), written
+
+
+def write(scope, place_ids, entries):
+    with transaction.atomic():
+        SimilarPlace.objects.filter(place__in=place_ids, scope=scope).delete()
+        SimilarPlace.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
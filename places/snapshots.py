@@ -0,0 +1,229 @@
+"""
+Prerendered snapshots of the pages anonymous visitors see most.
+
+The front page and the detail pages of the SNAPSHOT_PLACES top ranked
+places are rendered as an anonymous visitor sees them and written below
+SNAPSHOT_ROOT at their URL path, e.g. places/1/index.html, for the web
+server to send as they are, or else for SnapshotMiddleware. A change to a
+place or a scorecard deletes the snapshots it shows on, so visitors get the
+live page until the process_snapshots worker has rendered them again.
+Snapshots are only kept while SNAPSHOT_ROOT is set, on a disk every web
+server reads.
+"""
+import os
+import posixpath
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import FileResponse, Http404, HttpRequest
+from django.urls import resolve, reverse
+from django.utils.cache import patch_vary_headers
+
+from nuereview.middleware import AsyncCapableMiddleware
+
+from . import tasks, views
+from .models import Place, SnapshotTask
+
+SNAPSHOT_PLACES = 100
+
+VIEWS = {
+    'index': views.IndexView.as_view(),
+    'detail': views.DetailView.as_view(),
+}
+
+
+def root():
+    return getattr(settings, 'SNAPSHOT_ROOT', None)
+
+
+def popular_places():
+    """
+    Returns the places whose detail pages are snapshotted
+    """
+    return Place.objects.filter(
+        rank__lte=getattr(settings, 'SNAPSHOT_PLACES', SNAPSHOT_PLACES))
+
+
+def index_path():
+    return reverse('places:index')
+
+
+def place_path(place_id):
+    return reverse('places:detail', args=(place_id,))
+
+
+def file_path(path):
+    """
+    Returns the snapshot file of a URL path, within SNAPSHOT_ROOT
+    """
+    relative = posixpath.normpath('/' + path).strip('/')
+    return os.path.join(root(), relative, 'index.html')
+
+
+def remove(paths):
+    for path in paths:
+        try:
+            os.remove(file_path(path))
+        except FileNotFoundError:
+            pass
+
+
+def enqueue(paths):
+    """
+    Requests renderings of paths, coalescing with pending requests
+    """
+    SnapshotTask.objects.bulk_create(
+        [SnapshotTask(path=path) for path in paths], ignore_conflicts=True)
+
+
+def invalidate(paths):
+    remove(paths)
+    enqueue(paths)
+
+
+def place_changed(place_id):
+    """
+    Invalidates the snapshots showing a place, its name and suburb are on
+    the front page
+    """
+    if not root():
+        return
+    remove([index_path(), place_path(place_id)])
+    paths = [index_path()]
+    if popular_places().filter(pk=place_id).exists():
+        paths.append(place_path(place_id))
+    enqueue(paths)
+
+
+def scorecards_changed(place_ids):
+    """
+    Invalidates the snapshots of the popular places in the suburbs of
+    places whose scorecards changed, as their suburb ranks may have moved
+    """
+    if not root():
+        return
+    suburbs = Place.objects.filter(pk__in=place_ids).values('suburb')
+    invalidate([place_path(pk) for pk in popular_places().filter(
+        suburb__in=suburbs).values_list('pk', flat=True)])
+
+
+def snapshotted_places():
+    """
+    Returns the ids of the places with a detail page snapshot
+    """
+    directory = os.path.dirname(file_path(index_path()))
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return set()
+    return {int(name) for name in names if name.isdigit()
+        and os.path.exists(os.path.join(directory, name, 'index.html'))}
+
+
+def ranking_changed(rebuild=False):
+    """
+    Snapshots the places that became popular and the front page, and
+    removes the snapshots of places that no longer are. With rebuild,
+    renders every snapshot again, e.g. after a deploy changed templates
+    """
+    if not root():
+        return
+    snapshotted = snapshotted_places()
+    popular = set(popular_places().values_list('pk', flat=True))
+    remove([place_path(pk) for pk in snapshotted - popular])
+    if not rebuild:
+        popular -= snapshotted
+    enqueue([index_path()] + [place_path(pk) for pk in sorted(popular)])
+
+
+def render(path):
+    """
+    Returns the page an anonymous visitor gets at path, or None if it is
+    not snapshotted
+    """
+    match = resolve(path)
+    if match.url_name == 'detail' and not popular_places().filter(
+            pk=match.kwargs['pk']).exists():
+        return None
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.user = AnonymousUser()
+    try:
+        response = VIEWS[match.url_name](request, **match.kwargs)
+    except Http404:
+        return None
+    response.render()
+    return response.content
+
+
+def write(path, content):
+    """
+    Replaces the snapshot of path at once, so it is never read half written
+    """
+    target = file_path(path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(target), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(content)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, target)
+    except Exception:
+        os.remove(temporary)
+        raise
+
+
+def render_all(claimed):
+    for task in claimed:
+        content = render(task.path)
+        if content is None:
+            remove([task.path])
+        else:
+            write(task.path, content)
+
+
+def process(limit=100):
+    """
+    Renders up to limit queued snapshots, oldest first, returns the number
+    of snapshots rendered or removed
+    """
+    return tasks.process(SnapshotTask, render_all, limit)
+
+
+def stats():
+    """
+    Returns the number of queued snapshots and the age of the oldest
+    request in seconds
+    """
+    return tasks.stats(SnapshotTask)
+
+
+class SnapshotMiddleware(AsyncCapableMiddleware):
+    """
+    Serves snapshots to anonymous visitors, for deployments where the web
+    server does not. Requests with a query or a session are passed on
+    """
+
+    def call(self, request):
+        return self.snapshot(request) or self.get_response(request)
+
+    async def acall(self, request):
+        return self.snapshot(request) or await self.get_response(request)
+
+    def snapshot(self, request):
+        if (not root() or request.method not in ('GET', 'HEAD')
+                or request.META.get('QUERY_STRING')
+                or settings.SESSION_COOKIE_NAME in request.COOKIES
+                or not request.path_info.startswith(index_path())):
+            return None
+        try:
+            f = open(file_path(request.path_info), 'rb')
+        except OSError:
+            return None
+        response = FileResponse(f, content_type='text/html; charset=utf-8')
+        # Visitors with a session get the live page
+        patch_vary_headers(response, ['Cookie'])
+        return response
@@ -0,0 +1,113 @@
+"""
+Seeded generator of synthetic places, users and reviews.
+
+Review traffic is skewed like real traffic: place and reviewer popularity
+follow a Zipf distribution, so a few venues get most reviews and most
+reviewers only post a handful. The same seed always builds the same data,
+with visit dates spread over the days before now.
+"""
+import datetime
+import random
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from . import codec
+from .models import Place, Review, Feedback
+
+SUBURBS = (
+    ('Newtown', 'NSW', '2042', -33.897, 151.179),
+    ('Surry Hills', 'NSW', '2010', -33.886, 151.211),
+    ('Manly', 'NSW', '2095', -33.797, 151.288),
+    ('Fitzroy', 'VIC', '3065', -37.798, 144.978),
+    ('St Kilda', 'VIC', '3182', -37.868, 144.981),
+    ('Fortitude Valley', 'QLD', '4006', -27.457, 153.034),
+    ('Northbridge', 'WA', '6003', -31.947, 115.858),
+    ('Glenelg', 'SA', '5045', -34.980, 138.515),
+    ('Salamanca', 'TAS', '7004', -42.887, 147.331),
+    ('Braddon', 'ACT', '2612', -35.273, 149.133),
+)
+
+NAMES = ('Hotel', 'Tavern', 'Bar', 'Cafe', 'Bistro', 'Arms', 'Social',
+    'Kitchen', 'Taphouse', 'Diner')
+
+BATCH_SIZE = 5000
+
+
+def zipf_weights(n, exponent):
+    """
+    Returns cumulative weights of n items ranked by Zipf's law
+    """
+    weights = []
+    total = 0.0
+    for rank in range(1, n + 1):
+        total += 1 / rank ** exponent
+        weights.append(total)
+    return weights
+
+
+def bulk_create(model, objs, **kwargs):
+    """
+    Bulk creates objs and returns them with their primary keys, also on
+    backends that cannot return ids from bulk inserts
+    """
+    model.objects.bulk_create(objs, **kwargs)
+    if objs and objs[0].pk is None:
+        objs = list(model.objects.order_by('-pk')[:len(objs)])
+        objs.reverse()
+    return objs
+
+
+def generate(places, users, reviews, seed=0, skew=1.1, days=365):
+    """
+    Creates the given number of places, users and reviews, returns the
+    ids of the created places, hottest first
+    """
+    rng = random.Random(seed)
+    prefix = 'synthetic%d' % seed
+
+    place_objs = []
+    for i in range(places):
+        suburb, state, postcode, latitude, longitude = rng.choice(SUBURBS)
+        place = Place(
+            name='%s %s %d' % (rng.choice(NAMES), suburb, i),
+            street_address='%d Synthetic St' % rng.randint(1, 999),
+            suburb=suburb, state=state, postcode=postcode,
+            latitude=latitude + rng.uniform(-0.02, 0.02),
+            longitude=longitude + rng.uniform(-0.02, 0.02))
+        # bulk_create skips save()
+        place.cell = place.get_cell()
+        place_objs.append(place)
+    place_ids = [place.pk for place in
+        bulk_create(Place, place_objs, batch_size=BATCH_SIZE)]
+    # How likely each place is to be rated good
+    quality = {pk: rng.betavariate(2, 2) for pk in place_ids}
+
+    user_ids = [user.pk for user in bulk_create(User,
+        [User(username='%s_user%d' % (prefix, i), password='!')
+        for i in range(users)], batch_size=BATCH_SIZE)]
+
+    place_weights = zipf_weights(len(place_ids), skew)
+    user_weights = zipf_weights(len(user_ids), skew)
+    now = timezone.now()
+    for start in range(0, reviews, BATCH_SIZE):
+        count = min(BATCH_SIZE, reviews - start)
+        review_objs = [Review(
+            place_id=place_id, reviewer_id=reviewer_id,
+            visit_date=now - datetime.timedelta(
+                seconds=rng.randint(0, days * 24 * 60 * 60)))
+            for place_id, reviewer_id in zip(
+                rng.choices(place_ids, cum_weights=place_weights, k=count),
+                rng.choices(user_ids, cum_weights=user_weights, k=count))]
+        review_objs = bulk_create(Review, review_objs)
+        feedback_objs = []
+        for review in review_objs:
+            rated = rng.sample(codec.ATTRIBUTES, rng.randint(
+                Feedback.MIN_POINTS, len(codec.ATTRIBUTES)))
+            values = {attr: rng.random() < quality[review.place_id]
+                for attr in rated}
+            positive, negative = codec.encode(values)
+            feedback_objs.append(Feedback(review=review, positive=positive,
+                negative=negative, **values))
+        Feedback.objects.bulk_create(feedback_objs)
+    return place_ids
@@ -0,0 +1,91 @@
+"""
+Database-backed task queues, see places.queue and places.snapshots.
+
+A task model has the work it requests as primary key, so repeated requests
+for the same work coalesce into one pending task, and a 'requested' time.
+Workers claim the oldest tasks by deleting them, skipping those other
+workers or still open enqueuing transactions hold locked, and queue them
+again when the work fails.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+
+def process(model, handle, limit=100):
+    """
+    Claims up to limit tasks of model, oldest first, and passes the list to
+    handle, returns the number of tasks claimed
+    """
+    with transaction.atomic():
+        tasks = model.objects.order_by('requested')
+        if connection.features.has_select_for_update_skip_locked:
+            # Lets several workers claim different tasks
+            tasks = tasks.select_for_update(skip_locked=True)
+        tasks = list(tasks[:limit])
+        # Claim before working, so changes made meanwhile queue the work
+        # again instead of finding it still queued
+        model.objects.filter(pk__in=[task.pk for task in tasks]).delete()
+    if not tasks:
+        return 0
+    try:
+        handle(tasks)
+    except Exception:
+        model.objects.bulk_create(tasks, ignore_conflicts=True)
+        raise
+    return len(tasks)
+
+
+def stats(model):
+    """
+    Returns the number of queued tasks and the age of the oldest request in
+    seconds
+    """
+    queue = model.objects.aggregate(
+        depth=Count('pk'), oldest=Min('requested'))
+    lag = 0.0
+    if queue['oldest'] is not None:
+        lag = (timezone.now() - queue['oldest']).total_seconds()
+    return {'depth': queue['depth'], 'lag': lag}
+
+
+class WorkerCommand(BaseCommand):
+    """
+    Processes a queue in batches until stopped, subclasses define process()
+    and stats() and the message logged for each batch
+    """
+    # Formatted with the number of tasks and the seconds they took
+    done = 'Processed %d tasks in %.2fs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+            help='Exit once the queue is empty')
+        parser.add_argument('--stats', action='store_true',
+            help='Print the queue depth and lag and exit')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=1.0,
+            help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write('depth %(depth)d lag %(lag).1fs' % self.stats())
+            return
+        while True:
+            start = time.monotonic()
+            count = self.process(options['batch_size'])
+            if count:
+                self.stdout.write(self.done % (
+                    count, time.monotonic() - start))
+            elif options['once']:
+                return
+            else:
+                time.sleep(options['interval'])
+
+    def process(self, limit):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
@@ -0,0 +1,27 @@
+"""
+{% bundle 'site.js' %} includes a STATIC_BUNDLES bundle as build_static
+wrote it, or its source files one by one until it has run, e.g. on a
+fresh checkout.
+"""
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+register = template.Library()
+
+TAGS = {
+    '.js': '<script src="{}"></script>',
+    '.css': '<link rel="stylesheet" href="{}">',
+}
+
+
+@register.simple_tag
+def bundle(name):
+    if getattr(staticfiles_storage, 'hashed_files', None):
+        paths = ['bundles/' + name]
+    else:
+        paths = settings.STATIC_BUNDLES[name]
+    tag = TAGS[name[name.rindex('.'):]]
+    return format_html_join('\n', tag, ((static(path),) for path in paths))
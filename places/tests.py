@@ -1,3 +1,1411 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import StringIO
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache as django_cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.backends.signals import connection_created
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (admin, async_views, benchmarks, cache, codec, cube, export, geo,
+    leaderboards, queue, rollups, search, similarity, snapshots, synthetic,
+    timestamps, views)
+from .models import (ImportCheckpoint, Place, Review, Feedback, Scorecard,
+    ScorecardTask, ScoreRollup, SimilarPlace, SnapshotTask)
+from .views import IndexView
+
+
+@contextmanager
+def commit_hooks():
+    """
+    Runs the on_commit callbacks registered in the block as a commit would,
+    which the transaction of a TestCase never does
+    """
+    start = len(connection.run_on_commit)
+    yield
+    while len(connection.run_on_commit) > start:
+        savepoints, callback = connection.run_on_commit.pop(start)
+        callback()
+
+
+def create_place(name='The Local', suburb='Newtown', state='NSW',
+        postcode='2042', **location):
+    return Place.objects.create(name=name, street_address='1 King St',
+        suburb=suburb, state=state, postcode=postcode, **location)
+
+
+def create_review(place, reviewer, days_ago=0, **feedback):
+    """
+    Creates a review with feedback, e.g. create_review(p, u, food=True)
+    """
+    review = Review.objects.create(place=place, reviewer=reviewer,
+        visit_date=timezone.now() - datetime.timedelta(days=days_ago))
+    Feedback.objects.create(review=review, **feedback)
+    return review
+
+
+class ScorecardDeltaTests(TestCase):
+
+    def setUp(self):
+        self.place = create_place()
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+        self.scorecard = Scorecard.objects.create(place=self.place)
+
+    def add(self, reviewer, days_ago=0, **feedback):
+        review = Review(place=self.place, reviewer=reviewer,
+            visit_date=timezone.now() - datetime.timedelta(days=days_ago))
+        self.scorecard = Scorecard.add_review(review,
+            Feedback(review=review, **feedback))
+
+    def test_new_reviewers_add_up(self):
+        self.add(self.alice, food=True, service=False, value=True)
+        self.add(self.bob, food=True, service=False, speed=False)
+        self.assertEqual(self.scorecard.scores,
+            {'food': 2, 'service': -2, 'value': 1, 'speed': -1})
+
+    def test_latest_review_replaces_previous(self):
+        self.add(self.alice, days_ago=2, food=True, service=True, value=True)
+        self.add(self.alice, food=False, service=True, decor=True)
+        self.scorecard.refresh_from_db()
+        # No current review rates value any more
+        self.assertEqual(self.scorecard.scores,
+            {'food': -1, 'service': 1, 'decor': 1})
+        self.assertEqual(self.scorecard.scores,
+            Scorecard.compute_scores([self.place.pk])[self.place.pk])
+
+    def test_older_review_is_ignored(self):
+        self.add(self.alice, food=True, service=True, value=True)
+        self.add(self.alice,
+            days_ago=5, food=False, service=False, value=False)
+        self.assertEqual(self.scorecard.scores,
+            {'food': 1, 'service': 1, 'value': 1})
+
+    def new_review(self, reviewer, **feedback):
+        review = Review(place=self.place, reviewer=reviewer,
+            visit_date=timezone.now())
+        return review, Feedback(review=review, **feedback)
+
+    def test_add_review(self):
+        self.scorecard.delete()
+        # Counted once, with the review creating the scorecard
+        create_review(self.place, self.bob, days_ago=1, food=True,
+            decor=True, drink=True)
+        Scorecard.add_review(*self.new_review(self.alice, food=False,
+            decor=True, drink=True))
+        Scorecard.add_review(*self.new_review(self.bob, food=False,
+            decor=False, drink=True))
+        self.assertEqual(Scorecard.objects.get(place=self.place).scores,
+            {'food': -2, 'decor': 0, 'drink': 2})
+        self.assertEqual(Scorecard.objects.get(place=self.place).scores,
+            Scorecard.compute_scores([self.place.pk])[self.place.pk])
+
+
+@skipUnless(connection.features.has_select_for_update,
+    'the database has no row locks')
+class ConcurrentScorecardTests(TransactionTestCase):
+
+    def test_parallel_reviews_stay_exact(self):
+        place = create_place()
+        users = [User.objects.create_user('user%d' % i) for i in range(10)]
+
+        def post(n):
+            try:
+                # Reviewers review again, replacing their previous review
+                review = Review(place=place, reviewer=users[n % len(users)],
+                    visit_date=timezone.now())
+                ratings = {attr: (n + i) % 3 == 0 for i, attr
+                    in enumerate(codec.ATTRIBUTES) if (n + i) % 3 != 1}
+                Scorecard.add_review(review, Feedback(review=review,
+                    **ratings))
+                if n % 20 == 0:
+                    Scorecard.rebuild([place.pk])
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(16) as pool:
+            list(pool.map(post, range(300)))
+        self.assertEqual(Review.objects.count(), 300)
+        self.assertEqual(Scorecard.objects.get(place=place).scores,
+            Scorecard.compute_scores([place.pk])[place.pk])
+
+
+class RebuildScorecardsTests(TestCase):
+
+    def setUp(self):
+        self.place = create_place()
+        self.other = create_place(name='The Other')
+        alice = User.objects.create_user('alice')
+        bob = User.objects.create_user('bob')
+        create_review(self.place, alice, days_ago=3,
+            food=False, service=False, value=False)
+        create_review(self.place, alice, food=True, service=True, decor=False)
+        create_review(self.place, bob, food=True, drink=True, speed=True)
+
+    def rebuild(self, *args):
+        call_command('rebuild_scorecards', '--workers', '1', *args,
+            stdout=StringIO())
+
+    def test_counts_latest_review_per_reviewer(self):
+        self.rebuild()
+        self.assertEqual(Scorecard.objects.get(place=self.place).scores,
+            {'food': 2, 'service': 1, 'decor': -1, 'drink': 1, 'speed': 1})
+        self.assertFalse(Scorecard.objects.filter(place=self.other).exists())
+
+    def test_dry_run_saves_nothing(self):
+        self.rebuild('--dry-run')
+        self.assertFalse(Scorecard.objects.exists())
+
+    def test_matches_compute_scores(self):
+        self.rebuild('--places', str(self.place.pk))
+        self.assertEqual(Scorecard.objects.get(place=self.place).scores,
+            Scorecard.compute_scores([self.place.pk])[self.place.pk])
+
+
+class FeedbackCodecTests(TestCase):
+
+    def test_round_trip(self):
+        values = {'food': True, 'service': False, 'value': True}
+        positive, negative = codec.encode(values)
+        self.assertEqual(codec.names(positive), ['food', 'value'])
+        self.assertEqual(codec.names(negative), ['service'])
+        decoded = codec.decode(positive, negative)
+        self.assertEqual({k: v for k, v in decoded.items() if v is not None},
+            values)
+
+    def test_saved_masks_match_columns(self):
+        review = create_review(create_place(),
+            User.objects.create_user('alice'), decor=True, drink=False)
+        review.feedback.refresh_from_db()
+        self.assertEqual(
+            (review.feedback.positive, review.feedback.negative),
+            codec.encode({'decor': True, 'drink': False}))
+        self.assertEqual(review.feedback.get_counts(), (1, 1))
+        self.assertEqual(str(review.feedback), 'pos[decor,], neg[drink,]')
+
+    def test_tally_without_numpy(self):
+        rows = [(1, *codec.encode({'food': True, 'decor': False})),
+            (1, *codec.encode({'food': False, 'speed': True})),
+            (2, *codec.encode({'value': False}))]
+        expected = {1: {'food': 0, 'decor': -1, 'speed': 1},
+            2: {'value': -1}}
+        self.assertEqual(codec.tally(rows), expected)
+        with mock.patch.object(codec, 'numpy', None):
+            self.assertEqual(codec.tally(rows), expected)
+
+
+class IndexViewTests(TestCase):
+
+    def setUp(self):
+        for i in range(5):
+            create_place(name='Place %d' % i)
+        # Scores the last place highest so ranks differ from primary keys
+        place = Place.objects.last()
+        Scorecard.objects.create(place=place, scores={'food': 3})
+        call_command('rank_places', stdout=StringIO())
+        self.top = place
+
+    def test_no_places(self):
+        Place.objects.all().delete()
+        response = self.client.get(reverse('places:index'))
+        self.assertContains(response, 'No top places to display')
+
+    def test_unranked_places_follow_ranked(self):
+        Place.objects.filter(rank__in=[2, 3]).update(rank=None)
+        new = create_place(name='Place 5')
+        with mock.patch.object(IndexView, 'page_size', 2):
+            response = self.client.get(reverse('places:index'))
+            seen = list(response.context['top_places_list'])
+            while response.context['next_cursor']:
+                response = self.client.get(reverse('places:index'),
+                    {'after': response.context['next_cursor']})
+                seen += response.context['top_places_list']
+        self.assertEqual([p.rank for p in seen], [1, 4, 5, None, None, None])
+        self.assertEqual([p.pk for p in seen[3:]], sorted(
+            Place.objects.filter(rank=None).values_list('pk', flat=True)))
+        self.assertEqual(seen[-1], new)
+
+    def test_pages_follow_rank(self):
+        with mock.patch.object(IndexView, 'page_size', 2):
+            response = self.client.get(reverse('places:index'))
+            self.assertEqual(response.context['top_places_list'][0], self.top)
+            self.assertEqual(response.context['next_cursor'], 2)
+            seen = list(response.context['top_places_list'])
+            while response.context['next_cursor']:
+                response = self.client.get(reverse('places:index'),
+                    {'after': response.context['next_cursor']})
+                seen += response.context['top_places_list']
+        self.assertEqual(len(seen), 5)
+        self.assertEqual([p.rank for p in seen], [1, 2, 3, 4, 5])
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.local = create_place(name='The Local Taphouse', suburb='Darlinghurst',
+            postcode='2010')
+        self.union = create_place(name='Union Hotel', suburb='Newtown',
+            postcode='2042')
+        self.esplanade = create_place(name='Esplanade Hotel', suburb='St Kilda',
+            state='VIC', postcode='3182')
+
+    def test_prefix_matches(self):
+        self.assertEqual(search.search_places('union'), [self.union])
+        self.assertEqual(search.search_places('newt'), [self.union])
+        self.assertEqual(search.search_places('20'), [self.local, self.union])
+
+    def test_fuzzy_matches(self):
+        self.assertEqual(search.search_places('esplenade'), [self.esplanade])
+
+    def test_state_filter(self):
+        self.assertEqual(search.search_places('hotel', state='VIC'),
+            [self.esplanade])
+
+    def test_index_sees_new_places(self):
+        search.search_places('hotel')
+        with commit_hooks():
+            sando = create_place(name='Sando Hotel', suburb='Newtown')
+        self.assertIn(sando, search.search_places('sando'))
+
+    def test_index_view_search_mode(self):
+        response = self.client.get(reverse('places:index'), {'q': 'union'})
+        self.assertEqual(list(response.context['top_places_list']),
+            [self.union])
+        self.assertIsNone(response.context['next_cursor'])
+
+
+class DetailCacheTests(TestCase):
+
+    def setUp(self):
+        django_cache.clear()
+        self.place = create_place()
+        self.url = reverse('places:detail', args=(self.place.pk,))
+
+    def test_repeat_views_skip_the_database(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'The Local')
+
+    def test_scorecard_save_invalidates(self):
+        self.client.get(self.url)
+        Scorecard.objects.create(place=self.place, scores={'food': 4})
+        self.assertContains(self.client.get(self.url), '+4')
+
+    def test_place_edit_invalidates(self):
+        self.client.get(self.url)
+        self.place.name = 'The Regional'
+        version = cache.place_version(self.place.pk)
+        with commit_hooks():
+            self.place.save()
+            # Readers still see the old place until the commit
+            self.assertEqual(cache.place_version(self.place.pk), version)
+        self.assertContains(self.client.get(self.url), 'The Regional')
+
+    def test_bump_during_a_view_invalidates(self):
+        self.client.get(self.url)
+        Place.objects.filter(pk=self.place.pk).update(name='The Regional')
+
+        cached_place = cache.cached_place
+
+        def read_then_bump(place_id):
+            place = cached_place(place_id)
+            # A change committed just after the view read the place
+            cache.bump_place_version(place_id)
+            return place
+        with mock.patch.object(cache, 'cached_place',
+                side_effect=read_then_bump):
+            self.assertContains(self.client.get(self.url), 'The Local')
+        self.assertContains(self.client.get(self.url), 'The Regional')
+
+    def test_ranks_outlive_reviews_of_other_suburbs(self):
+        other = create_place(name='The Other', suburb='Glebe')
+        self.client.get(self.url)
+        with mock.patch.object(leaderboards, 'ranks',
+                wraps=leaderboards.ranks) as ranks:
+            Scorecard.objects.create(place=other, scores={'food': 1})
+            self.client.get(self.url)
+            self.assertEqual(ranks.call_count, 0)
+            Scorecard.objects.create(place=create_place(name='The Next'),
+                scores={'food': 2})
+            self.client.get(self.url)
+            self.assertEqual(ranks.call_count, 1)
+
+    def test_reviews_of_other_suburbs_keep_the_cache(self):
+        other = create_place(name='The Other', suburb='Glebe')
+        self.client.get(self.url)
+        create_review(other, User.objects.create_user('alice'), food=True,
+            decor=True, value=True)
+        Scorecard.rebuild([other.pk])
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_missing_place(self):
+        response = self.client.get(reverse('places:detail', args=(0,)))
+        self.assertEqual(response.status_code, 404)
+
+
+class RebuildCacheTests(TransactionTestCase):
+
+    def test_rebuild_invalidates_on_commit(self):
+        django_cache.clear()
+        place = create_place()
+        url = reverse('places:detail', args=(place.pk,))
+        self.client.get(url)
+        create_review(place, User.objects.create_user('alice'),
+            food=True, decor=True, value=True)
+        Scorecard.rebuild([place.pk])
+        self.assertContains(self.client.get(url), 'Decor')
+
+
+class ImportReviewsTests(TestCase):
+
+    def setUp(self):
+        self.place = create_place()
+        User.objects.create_user('alice')
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_jsonl(self):
+        path = self.write('reviews.jsonl', '\n'.join([
+            '{"place": %d, "reviewer": "alice", "visit_date": "2021-01-01T12:00",'
+            ' "food": "good", "service": "poor", "value": true}' % self.place.pk,
+            '{"place": %d, "reviewer": "alice", "visit_date": "2021-02-01T12:00",'
+            ' "food": "poor", "service": "poor", "value": true}' % self.place.pk,
+            '{"place": %d, "visit_date": "2021-01-01", "food": "good"}'
+                % self.place.pk,
+            '{"place": 0, "visit_date": "2021-01-01T12:00", "food": "good",'
+            ' "service": "good", "value": "good"}',
+            'not json',
+        ]))
+        err = StringIO()
+        call_command('import_reviews', path, '--chunk-size', '2',
+            stdout=StringIO(), stderr=err)
+        self.assertEqual(Review.objects.count(), 2)
+        self.assertEqual(len(err.getvalue().splitlines()), 3)
+        self.assertEqual(Scorecard.objects.get(place=self.place).scores,
+            {'food': -1, 'service': -1, 'value': 1})
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_empty_file(self):
+        call_command('import_reviews', self.write('reviews.jsonl', '\n'),
+            stdout=StringIO())
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_invalid_values_are_reported(self):
+        path = self.write('reviews.jsonl', '\n'.join([
+            '{"place": %d, "visit_date": "2021-01-01T12:00", "food": ["good"],'
+            ' "service": "good", "value": "good"}' % self.place.pk,
+            '{"place": "\u00b2", "visit_date": "2021-01-01T12:00",'
+            ' "food": "good", "service": "good", "value": "good"}',
+            '{"place": %d, "reviewer": ["alice"], "visit_date": "2021-01-01",'
+            ' "food": "good", "service": "good", "value": "good"}'
+                % self.place.pk,
+            '{"place": "%d", "visit_date": "2021-01-01T12:00", "food": "good",'
+            ' "service": "good", "value": "good"}' % self.place.pk,
+        ]))
+        err = StringIO()
+        call_command('import_reviews', path, stdout=StringIO(), stderr=err)
+        self.assertEqual(Review.objects.count(), 1)
+        self.assertEqual(len(err.getvalue().splitlines()), 3)
+
+    def test_csv_resumes_from_checkpoint(self):
+        path = self.write('reviews.csv',
+            'place,reviewer,visit_date,food,decor,drink\n'
+            '%(pk)d,alice,2021-01-01T12:00,good,good,good\n'
+            '%(pk)d,,2021-01-02T12:00,poor,poor,poor\n' % {'pk': self.place.pk})
+        ImportCheckpoint.objects.create(name=os.path.abspath(path), rows=1,
+            imported=1, places=[self.place.pk])
+        call_command('import_reviews', path, stdout=StringIO())
+        self.assertEqual(Review.objects.get().reviewer, None)
+        self.assertEqual(Review.objects.get().feedback.get_counts(), (0, 3))
+        self.assertEqual(Scorecard.objects.get(place=self.place).scores,
+            {'food': -1, 'decor': -1, 'drink': -1})
+
+    def test_interrupted_chunk_is_imported_once(self):
+        path = self.write('reviews.csv', 'place,visit_date,food,decor,drink\n'
+            + '%d,2021-01-01T12:00,good,good,good\n' % self.place.pk * 3)
+        save = ImportCheckpoint.save
+
+        def interrupt(checkpoint, *args, **kwargs):
+            save(checkpoint, *args, **kwargs)
+            if checkpoint.rows == 2:
+                raise KeyboardInterrupt
+        with mock.patch.object(ImportCheckpoint, 'save', interrupt), \
+                self.assertRaises(KeyboardInterrupt):
+            call_command('import_reviews', path, '--chunk-size', '1',
+                stdout=StringIO())
+        self.assertEqual(Review.objects.count(), 1)
+        call_command('import_reviews', path, '--chunk-size', '1',
+            stdout=StringIO())
+        self.assertEqual(Review.objects.count(), 3)
+
+
+class ExportReviewsTests(TestCase):
+
+    def setUp(self):
+        self.place = create_place()
+        self.alice = User.objects.create_user('alice')
+        self.first = create_review(self.place, self.alice, days_ago=2,
+            food=True, service=False, value=True)
+        self.second = create_review(self.place, None, days_ago=1,
+            food=False, decor=False, drink=False)
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def run_export(self, name, *args):
+        path = os.path.join(self.dir.name, name)
+        call_command('export_reviews', path, '--chunk-size', '1', *args,
+            stdout=StringIO())
+        return path
+
+    def test_csv(self):
+        with open(self.run_export('reviews.csv', '--format', 'csv')) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([int(row['review']) for row in rows],
+            [self.first.pk, self.second.pk])
+        self.assertEqual(rows[1]['reviewer'], '')
+        self.assertEqual(codec.decode(int(rows[0]['positive']),
+            int(rows[0]['negative']))['service'], False)
+        self.assertEqual(rows[0]['suburb'], 'Newtown')
+
+    @skipUnless(export.numpy, 'numpy is not installed')
+    def test_npy(self):
+        path = self.run_export('reviews', '--format', 'npy')
+        review = export.numpy.load(os.path.join(path, 'review.npy'),
+            mmap_mode='r')
+        self.assertEqual(review.tolist(), [self.first.pk, self.second.pk])
+        reviewer = export.numpy.load(os.path.join(path, 'reviewer.npy'))
+        self.assertEqual(reviewer.tolist(), [self.alice.pk, -1])
+        negative = export.numpy.load(os.path.join(path, 'negative.npy'))
+        self.assertEqual(codec.names(int(negative[1])),
+            ['decor', 'drink', 'food'])
+        visit_date = export.numpy.load(os.path.join(path, 'visit_date.npy'))
+        self.assertEqual(visit_date[0], timestamps.micros(
+            self.first.visit_date))
+        places = export.numpy.load(os.path.join(path, 'places.npy'))
+        self.assertEqual(places['suburb'].tolist(), ['Newtown'])
+
+    def test_watermark(self):
+        watermark = os.path.join(self.dir.name, 'watermark.json')
+        self.run_export('first.csv', '--format', 'csv', '--watermark', watermark)
+        third = create_review(self.place, self.alice, food=True, decor=True,
+            drink=True)
+        # Too recent, it may still be written along with older reviews
+        self.run_export('empty.csv', '--format', 'csv', '--watermark', watermark)
+        with mock.patch.object(export, 'SETTLE', 0):
+            path = self.run_export('second.csv', '--format', 'csv',
+                '--watermark', watermark)
+        with open(os.path.join(self.dir.name, 'empty.csv')) as f:
+            self.assertEqual(len(list(csv.DictReader(f))), 0)
+        with open(path) as f:
+            self.assertEqual([int(row['review']) for row in csv.DictReader(f)],
+                [third.pk])
+
+
+class ScorecardQueueTests(TestCase):
+
+    def setUp(self):
+        django_cache.clear()
+        self.place = create_place()
+        self.user = User.objects.create_user('alice')
+        self.client.force_login(self.user)
+        self.url = reverse('places:postreview', args=(self.place.pk,))
+
+    def post(self, **ratings):
+        return self.client.post(self.url, ratings)
+
+    @override_settings(SCORECARD_QUEUE=True)
+    def test_reviews_of_one_place_coalesce(self):
+        self.post(food='good', decor='good', drink='poor')
+        self.post(food='poor', decor='good', drink='poor')
+        self.assertEqual(queue.stats()['depth'], 1)
+        self.assertFalse(Scorecard.objects.exists())
+        self.assertEqual(queue.process(), 1)
+        self.assertEqual(queue.stats(), {'depth': 0, 'lag': 0.0})
+        self.assertEqual(Scorecard.objects.get(place=self.place).scores,
+            {'food': -1, 'decor': 1, 'drink': -1})
+
+    @override_settings(SCORECARD_QUEUE=False)
+    def test_synchronous_fallback(self):
+        self.post(food='good', decor='good', drink='poor')
+        self.assertFalse(ScorecardTask.objects.exists())
+        self.assertEqual(Scorecard.objects.get(place=self.place).scores,
+            {'food': 1, 'decor': 1, 'drink': -1})
+
+    def test_rollup_failure_saves_nothing(self):
+        for queued in (True, False):
+            with override_settings(SCORECARD_QUEUE=queued), \
+                    mock.patch.object(rollups, 'record',
+                        side_effect=RuntimeError), \
+                    self.assertRaises(RuntimeError):
+                self.post(food='good', decor='good', drink='poor')
+            self.assertFalse(Review.objects.exists())
+            self.assertFalse(ScorecardTask.objects.exists())
+        # The idempotency key was released
+        self.post(food='good', decor='good', drink='poor')
+        self.assertEqual(ScoreRollup.objects.filter(period='day').count(), 3)
+
+    def test_too_few_feedback_points(self):
+        response = self.post(food='good', decor='good')
+        self.assertContains(response, 'Minimum 3 feedback points required')
+        self.assertFalse(Review.objects.exists())
+
+
+@skipUnless(connection.features.has_select_for_update_skip_locked,
+    'the database cannot skip locked rows')
+class ScorecardQueueRaceTests(TransactionTestCase):
+
+    def test_worker_waits_for_the_enqueuing_review(self):
+        place = create_place()
+        alice = User.objects.create_user('alice')
+        create_review(place, alice, days_ago=1, food=True, decor=True,
+            drink=True)
+        queue.enqueue(place.pk)
+        enqueued = threading.Event()
+        counted = threading.Event()
+
+        def post():
+            try:
+                with transaction.atomic():
+                    create_review(place, alice, food=False, decor=False,
+                        drink=False)
+                    queue.enqueue(place.pk)
+                    enqueued.set()
+                    counted.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=post)
+        thread.start()
+        self.assertTrue(enqueued.wait(10))
+        # The pending task is locked until the review commits
+        self.assertEqual(queue.process(), 0)
+        counted.set()
+        thread.join()
+        self.assertEqual(queue.process(), 1)
+        self.assertEqual(Scorecard.objects.get(place=place).scores,
+            {'food': -1, 'decor': -1, 'drink': -1})
+
+
+class ApiTests(TestCase):
+
+    def setUp(self):
+        django_cache.clear()
+        self.place = create_place()
+        Scorecard.objects.create(place=self.place, scores={'food': 2})
+        for i in range(4):
+            create_place(name='Place %d' % i)
+        call_command('rank_places', stdout=StringIO())
+
+    def get_json(self, response):
+        if response.streaming:
+            return json.loads(b''.join(response.streaming_content))
+        return response.json()
+
+    def test_detail_conditional_get(self):
+        url = reverse('places:api_detail', args=(self.place.pk,))
+        response = self.client.get(url)
+        self.assertEqual(self.get_json(response)['scorecard']['scores'],
+            {'food': 2})
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.place.scorecard.scores = {'food': 3}
+        self.place.scorecard.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_json(response)['scorecard']['scores'],
+            {'food': 3})
+
+    def test_place_edit_changes_last_modified(self):
+        url = reverse('places:api_detail', args=(self.place.pk,))
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url,
+            HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        # A second later, Last-Modified has whole seconds
+        Place.objects.filter(pk=self.place.pk).update(name='The Regional',
+            updated=self.place.scorecard.updated
+            + datetime.timedelta(seconds=1))
+        cache.bump_place_version(self.place.pk)
+        self.assertEqual(self.client.get(url,
+            HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_scorecard_without_reviews(self):
+        place = create_place(name='New')
+        response = self.client.get(
+            reverse('places:api_scorecard', args=(place.pk,)))
+        self.assertEqual(response.json(), {'scores': {}, 'updated': None})
+
+    def test_list_pages(self):
+        url = reverse('places:api_list')
+        page = self.get_json(self.client.get(url, {'limit': 3}))
+        self.assertEqual([p['rank'] for p in page['results']], [1, 2, 3])
+        self.assertEqual(page['results'][0]['scores'], {'food': 2})
+        page = self.get_json(self.client.get(url,
+            {'limit': 3, 'after': page['next']}))
+        self.assertEqual([p['rank'] for p in page['results']], [4, 5])
+        self.assertIsNone(page['next'])
+
+    def test_list_unranked_places(self):
+        Place.objects.update(rank=None)
+        place = create_place(name='New')
+        url = reverse('places:api_list')
+        page = self.get_json(self.client.get(url, {'limit': 5}))
+        self.assertEqual(page['next'], 'u%d' % page['results'][-1]['id'])
+        page = self.get_json(self.client.get(url, {'after': page['next']}))
+        self.assertEqual([p['id'] for p in page['results']], [place.pk])
+        self.assertIsNone(page['next'])
+
+    def test_list_zero_limit(self):
+        page = self.get_json(self.client.get(reverse('places:api_list'),
+            {'limit': 0}))
+        self.assertEqual([p['rank'] for p in page['results']], [1])
+        self.assertEqual(page['next'], 1)
+
+    def test_list_conditional_get(self):
+        url = reverse('places:api_list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with commit_hooks():
+            create_place(name='Another')
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SyntheticDataTests(TestCase):
+
+    def test_generate_is_seeded_and_skewed(self):
+        place_ids = synthetic.generate(places=20, users=10, reviews=500,
+            seed=1)
+        self.assertEqual(Place.objects.count(), 20)
+        self.assertEqual(Review.objects.count(), 500)
+        self.assertEqual(Feedback.objects.count(), 500)
+        hot = Review.objects.filter(place=place_ids[0]).count()
+        cold = Review.objects.filter(place=place_ids[-1]).count()
+        self.assertGreater(hot, cold)
+        for feedback in Feedback.objects.all():
+            self.assertGreaterEqual(sum(feedback.get_counts()),
+                Feedback.MIN_POINTS)
+            self.assertEqual((feedback.positive, feedback.negative),
+                feedback.get_masks())
+
+        names = list(Place.objects.order_by('pk').values_list('name', flat=True))
+        Place.objects.all().delete()
+        synthetic.generate(places=20, users=0, reviews=0, seed=1)
+        self.assertEqual(names,
+            list(Place.objects.order_by('pk').values_list('name', flat=True)))
+
+    def test_seed_reviews(self):
+        call_command('seed_reviews', '--places', '5', '--users', '3',
+            '--reviews', '20', stdout=StringIO())
+        self.assertFalse(Place.objects.filter(rank=None).exists())
+
+        def counts():
+            return sorted(ScoreRollup.objects.values_list('place', 'period',
+                'start', 'attribute', 'positive', 'negative'))
+        seeded = counts()
+        self.assertTrue(seeded)
+        rollups.rebuild(list(Place.objects.values_list('pk', flat=True)))
+        self.assertEqual(counts(), seeded)
+
+    def test_benchmarks_report_every_case(self):
+        place_ids = synthetic.generate(places=20, users=10, reviews=200)
+        Scorecard.rebuild(place_ids)
+        results = benchmarks.run(place_ids,
+            User.objects.create_user('benchmark'), repeat=2)
+        self.assertEqual(set(results), {'postreview', 'postreview_queued',
+            'rebuild_scorecard', 'index', 'detail_cold', 'detail_warm'})
+        self.assertEqual(results['detail_warm']['queries'], 0)
+
+
+class RollupTests(TestCase):
+
+    def setUp(self):
+        self.place = create_place()
+        self.alice = User.objects.create_user('alice')
+
+    def test_cover_uses_fewest_buckets(self):
+        first = datetime.date(2021, 1, 27)
+        last = datetime.date(2021, 4, 13)
+        buckets = rollups.cover(first, last)
+        self.assertEqual(buckets[:5], [('day', datetime.date(2021, 1, 27)),
+            ('day', datetime.date(2021, 1, 28)),
+            ('day', datetime.date(2021, 1, 29)),
+            ('day', datetime.date(2021, 1, 30)),
+            ('day', datetime.date(2021, 1, 31))])
+        self.assertIn(('month', datetime.date(2021, 2, 1)), buckets)
+        self.assertIn(('month', datetime.date(2021, 3, 1)), buckets)
+        self.assertIn(('week', datetime.date(2021, 4, 5)), buckets)
+        days = set()
+        for period, start in buckets:
+            end = {'day': start, 'week': start + datetime.timedelta(6),
+                'month': rollups.next_month(start) - datetime.timedelta(1)
+                }[period]
+            while start <= end:
+                self.assertNotIn(start, days)
+                days.add(start)
+                start += datetime.timedelta(1)
+        self.assertEqual(len(days), (last - first).days + 1)
+
+    def test_record_matches_rebuild(self):
+        for days_ago, ratings in [(0, {'food': True, 'decor': False}),
+                (3, {'food': True, 'value': True}),
+                (40, {'food': False, 'service': True}),
+                (100, {'food': False, 'drink': True})]:
+            review = create_review(self.place, self.alice, days_ago, **ratings)
+            rollups.record(review, review.feedback)
+        recorded = set(ScoreRollup.objects.values_list('period', 'start',
+            'attribute', 'positive', 'negative'))
+        rollups.rebuild([self.place.pk])
+        rebuilt = set(ScoreRollup.objects.values_list('period', 'start',
+            'attribute', 'positive', 'negative'))
+        self.assertEqual(recorded, rebuilt)
+
+        self.assertEqual(rollups.window(self.place.pk, 30)['food'],
+            {'positive': 2, 'negative': 0, 'net': 2})
+        self.assertEqual(rollups.window(self.place.pk, 90)['food'],
+            {'positive': 2, 'negative': 1, 'net': 1})
+        trend = rollups.trend(self.place.pk, 'month', 5)
+        self.assertEqual(len(trend), 5)
+        self.assertEqual(sum(scores.get('food', (0, 0))[1]
+            for start, scores in trend), 2)
+
+    def test_trends_api(self):
+        self.client.force_login(self.alice)
+        self.client.post(reverse('places:postreview', args=(self.place.pk,)),
+            {'food': 'good', 'decor': 'poor', 'value': 'good'})
+        response = self.client.get(
+            reverse('places:api_trends', args=(self.place.pk,)))
+        data = response.json()
+        self.assertEqual(data['windows']['30']['decor']['net'], -1)
+        self.assertEqual(data['trend']['period'], 'week')
+        self.assertEqual(data['trend']['buckets'][-1]['scores']['food'],
+            {'positive': 1, 'negative': 0})
+
+
+class LeaderboardTests(TestCase):
+
+    def setUp(self):
+        self.union = create_place(name='Union Hotel', suburb='Newtown')
+        self.sando = create_place(name='Sando', suburb='Newtown')
+        self.esplanade = create_place(name='Esplanade', suburb='St Kilda',
+            state='VIC')
+        Scorecard.objects.create(place=self.union, scores={'food': 3})
+        Scorecard.objects.create(place=self.sando,
+            scores={'food': 5, 'value': -1})
+        Scorecard.objects.create(place=self.esplanade, scores={'food': 9})
+
+    def test_top_by_suburb_and_state(self):
+        top = leaderboards.top('food', suburb='newtown ')
+        self.assertEqual([(e.place, e.score) for e in top],
+            [(self.sando, 5), (self.union, 3)])
+        top = leaderboards.top('food', state='VIC')
+        self.assertEqual([e.place for e in top], [self.esplanade])
+
+    def test_follows_scorecard_and_place_changes(self):
+        self.union.scorecard.scores = {'food': 7}
+        self.union.scorecard.save()
+        self.assertEqual(leaderboards.top('food', suburb='Newtown')[0].place,
+            self.union)
+        self.union.suburb = 'Enmore'
+        self.union.save()
+        self.assertEqual([e.place for e in leaderboards.top('food',
+            suburb='Newtown')], [self.sando])
+        self.assertEqual([e.place for e in leaderboards.top('food',
+            suburb='Enmore')], [self.union])
+
+    def test_failures_after_the_commit_are_logged(self):
+        version = cache.place_version(self.union.pk)
+        review = Review(place=self.union,
+            reviewer=User.objects.create_user('alice'),
+            visit_date=timezone.now())
+        with mock.patch.object(leaderboards, 'refresh',
+                side_effect=IntegrityError), \
+                self.assertLogs('places.signals') as logs, commit_hooks():
+            Scorecard.add_review(review, Feedback(review=review, food=True,
+                decor=True, value=True))
+        self.assertIn('refresh_leaderboards', logs.output[0])
+        # The other receivers still ran
+        self.assertNotEqual(cache.place_version(self.union.pk), version)
+
+    def test_api(self):
+        url = reverse('places:api_leaderboard', args=('food',))
+        results = self.client.get(url, {'state': 'NSW', 'limit': 1}
+            ).json()['results']
+        self.assertEqual([(r['name'], r['score']) for r in results],
+            [('Sando', 5)])
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get(reverse('places:api_leaderboard',
+            args=('vibes',)), {'state': 'NSW'}).status_code, 404)
+
+
+@skipUnless(similarity.numpy, 'numpy is not installed')
+class SimilarPlaceTests(TestCase):
+
+    def setUp(self):
+        django_cache.clear()
+        self.pub = create_place(name='Union Hotel')
+        self.bar = create_place(name='Bank Hotel')
+        self.cafe = create_place(name='Black Star')
+        self.esplanade = create_place(name='Esplanade', suburb='St Kilda',
+            state='VIC')
+        # Similar profiles whatever the number of reviews
+        Scorecard.objects.create(place=self.pub,
+            scores={'drink': 4, 'atmosphere': 2, 'food': -1})
+        Scorecard.objects.create(place=self.bar,
+            scores={'drink': 10, 'atmosphere': 6})
+        Scorecard.objects.create(place=self.cafe,
+            scores={'food': 5, 'drink': -2})
+        Scorecard.objects.create(place=self.esplanade,
+            scores={'drink': 8, 'atmosphere': 4, 'food': -2})
+
+    def similar(self, place, scope):
+        return [(entry.similar, entry.position) for entry in
+            SimilarPlace.objects.filter(place=place, scope=scope
+                ).order_by('position')]
+
+    def test_scopes(self):
+        # One row per block
+        similarity.rebuild(SimilarPlace.ANYWHERE, k=2, block_cells=4)
+        self.assertEqual(self.similar(self.pub, SimilarPlace.ANYWHERE),
+            [(self.esplanade, 1), (self.bar, 2)])
+        # Dissimilar places are left out
+        self.assertEqual(self.similar(self.cafe, SimilarPlace.ANYWHERE), [])
+        similarity.rebuild(SimilarPlace.STATE, k=5)
+        self.assertEqual(self.similar(self.pub, SimilarPlace.STATE),
+            [(self.bar, 1)])
+        self.assertEqual(self.similar(self.esplanade, SimilarPlace.STATE), [])
+        self.assertEqual(self.similar(self.pub, SimilarPlace.ANYWHERE),
+            [(self.esplanade, 1), (self.bar, 2)])
+
+    def test_detail_page(self):
+        self.esplanade.scorecard.delete()
+        call_command('rebuild_similar_places', stdout=StringIO())
+        self.assertEqual(self.similar(self.esplanade, SimilarPlace.STATE), [])
+        url = reverse('places:detail', args=(self.pub.pk,))
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Similar venues')
+        self.assertEqual([entry.similar for entry
+            in response.context['similar_places']], [self.bar])
+
+
+@skipUnless(cube.numpy, 'numpy is not installed')
+class CubeTests(TestCase):
+
+    def setUp(self):
+        cube.clear()
+        self.addCleanup(cube.clear)
+        self.union = create_place(name='Union Hotel')
+        self.bank = create_place(name='Bank Hotel', postcode='2044')
+        self.esplanade = create_place(name='Esplanade', suburb='St Kilda',
+            state='VIC', postcode='3182')
+        self.alice = User.objects.create_user('alice')
+        self.review(self.union, '2021-01-10', food=True, drink=True)
+        self.review(self.bank, '2021-01-20', food=False, drink=True)
+        self.review(self.union, '2021-03-05', food=True)
+        self.review(self.esplanade, '2021-03-05', food=True, value=False)
+
+    def review(self, place, date, **feedback):
+        review = Review.objects.create(place=place, reviewer=self.alice,
+            visit_date=timezone.make_aware(datetime.datetime.fromisoformat(
+                date + 'T12:00')))
+        Feedback.objects.create(review=review, **feedback)
+
+    def test_roll_up_and_drill_down(self):
+        current = cube.get_cube()
+        with self.assertNumQueries(0):
+            self.assertEqual(current.query(), [{'positive': 5,
+                'negative': 2}])
+            self.assertEqual(current.query(['state'], attributes=['food']), [
+                {'state': 'NSW', 'positive': 2, 'negative': 1},
+                {'state': 'VIC', 'positive': 1, 'negative': 0}])
+            self.assertEqual(current.query(['postcode', 'month'],
+                state='nsw', attributes=['food'], postcode_digits=3), [
+                {'postcode': '204', 'month': '2021-01', 'positive': 1,
+                    'negative': 1},
+                {'postcode': '204', 'month': '2021-03', 'positive': 1,
+                    'negative': 0}])
+            self.assertEqual(current.query(['attribute'], postcode='2044'), [
+                {'attribute': 'drink', 'positive': 1, 'negative': 0},
+                {'attribute': 'food', 'positive': 0, 'negative': 1}])
+            self.assertEqual(current.query(['suburb'],
+                first=cube.parse_month('2021-02')), [
+                {'suburb': 'Newtown', 'positive': 1, 'negative': 0},
+                {'suburb': 'St Kilda', 'positive': 1, 'negative': 1}])
+
+    def test_incremental_refresh(self):
+        cube.get_cube()
+        self.review(self.bank, '2020-12-01', service=False)
+        brunswick = create_place(name='Retreat', suburb='Brunswick',
+            state='VIC', postcode='3056')
+        self.review(brunswick, '2021-05-01', service=True)
+        self.assertEqual(cube.get_cube().query(attributes=['service']), [])
+        with override_settings(CUBE_REFRESH_SECONDS=0):
+            current = cube.refresh()
+        self.assertIs(cube.get_cube(), current)
+        self.assertEqual(current.query(['month'], attributes=['service']), [
+            {'month': '2020-12', 'positive': 0, 'negative': 1},
+            {'month': '2021-05', 'positive': 1, 'negative': 0}])
+        self.assertEqual(current.query(['state'], attributes=['food']), [
+            {'state': 'NSW', 'positive': 2, 'negative': 1},
+            {'state': 'VIC', 'positive': 1, 'negative': 0}])
+
+    def test_refreshed_in_background(self):
+        current = cube.get_cube()
+        with mock.patch.object(cube, '_update') as update, \
+                override_settings(CUBE_REFRESH_SECONDS=0):
+            self.assertIs(cube.get_cube(), current)
+            # Released by the refresh thread once it is done
+            with cube._lock:
+                update.assert_called_once_with()
+
+    def test_api(self):
+        url = reverse('places:api_analytics')
+        self.client.force_login(self.alice)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.alice.is_staff = True
+        self.alice.save()
+        response = self.client.get(url, {'group': 'state,attribute',
+            'attribute': 'value', 'from': '2021-03', 'to': '2021-03'})
+        self.assertEqual(response.json()['groups'], [{'state': 'VIC',
+            'attribute': 'value', 'positive': 0, 'negative': 1}])
+        self.assertEqual(self.client.get(url, {'group': 'venue'}
+            ).status_code, 400)
+        self.assertEqual(self.client.get(url, {'from': '2021-13'}
+            ).status_code, 400)
+
+
+class NearbyTests(TestCase):
+
+    def setUp(self):
+        # Spread over neighbouring cells around Newtown
+        self.local = create_place('The Local', latitude=-33.8970,
+            longitude=151.1790)
+        self.union = create_place('Union Hotel', latitude=-33.8995,
+            longitude=151.1760)
+        self.enmore = create_place('Enmore Hotel', latitude=-33.9050,
+            longitude=151.1735)
+        self.manly = create_place('Manly Wharf', latitude=-33.7990,
+            longitude=151.2850)
+        create_place('No Address')
+
+    def test_cell(self):
+        self.assertEqual(self.local.cell, geo.cell(-33.897, 151.179))
+        self.assertNotEqual(self.local.cell, self.enmore.cell)
+        self.assertIsNone(Place.objects.get(name='No Address').cell)
+
+    def test_distance(self):
+        # Sydney to Melbourne is about 714km
+        self.assertAlmostEqual(geo.distance(-33.8688, 151.2093, -37.8136,
+            144.9631), 714, delta=2)
+
+    def test_within_matches_exact_distance(self):
+        places = Place.objects.all()
+        found = geo.within(places, -33.8970, 151.1790, 1.5)
+        self.assertEqual([place for d, place in found],
+            [self.local, self.union, self.enmore])
+        self.assertEqual(found[0][0], 0)
+        expected = sorted(place.name for place in places.exclude(
+            latitude=None) if geo.distance(-33.8970, 151.1790,
+            place.latitude, place.longitude) <= 20)
+        self.assertEqual(sorted(place.name for d, place in geo.within(
+            places, -33.8970, 151.1790, 20)), expected)
+
+    def test_nearest(self):
+        found = geo.nearest(Place.objects.all(), -33.8, 151.28, k=2)
+        self.assertEqual([place for d, place in found],
+            [self.manly, self.local])
+        found = geo.nearest(Place.objects.all(), -33.8, 151.28, k=2,
+            max_km=5)
+        self.assertEqual([place for d, place in found], [self.manly])
+
+    def test_api(self):
+        url = reverse('places:api_nearby')
+        results = self.client.get(url, {'lat': '-33.8995', 'lon': '151.176',
+            'limit': 2}).json()['results']
+        self.assertEqual([r['name'] for r in results],
+            ['Union Hotel', 'The Local'])
+        self.assertEqual(results[0]['distance_km'], 0)
+        self.assertEqual(self.client.get(url, {'lat': '95', 'lon': '151'}
+            ).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+        for radius in ('150', '-1', '0', 'far'):
+            self.assertEqual(self.client.get(url, {'lat': '-33.8995',
+                'lon': '151.176', 'radius': radius}).status_code, 400)
+
+
+class ReviewHistoryTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='secret')
+        self.places = [create_place('Place %d' % i) for i in range(5)]
+        visit_date = timezone.now()
+        for i in range(25):
+            # Pairs of reviews share a visit date to exercise the tiebreak
+            review = Review.objects.create(place=self.places[i % 5],
+                reviewer=self.alice,
+                visit_date=visit_date - datetime.timedelta(hours=i // 2))
+            Feedback.objects.create(review=review, food=True, decor=False,
+                value=True)
+        create_review(self.places[0], User.objects.create_user('bob'),
+            food=True)
+        self.client.force_login(self.alice)
+
+    def pages(self, page_size):
+        url = reverse('places:review_history')
+        with mock.patch.object(views.ReviewHistoryView, 'page_size',
+                page_size):
+            response = self.client.get(url)
+            yield response
+            while response.context['next_cursor']:
+                response = self.client.get(url,
+                    {'after': response.context['next_cursor']})
+                yield response
+
+    def test_pages_cover_own_reviews_latest_first(self):
+        seen = []
+        for response in self.pages(4):
+            seen += response.context['review_list']
+        self.assertEqual(seen, list(Review.objects.filter(
+            reviewer=self.alice).order_by('-visit_date', '-pk')))
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        for page_size in (1, 5, 25):
+            # Session, user and one joined query for the page
+            with self.assertNumQueries(3):
+                response = next(self.pages(page_size))
+            self.assertContains(response, 'Decor', count=page_size)
+
+    def test_login_required(self):
+        self.client.logout()
+        response = self.client.get(reverse('places:review_history'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_admin_history_query_count(self):
+        admin = User.objects.create_superuser('admin', password='secret')
+        self.client.force_login(admin)
+        url = reverse('admin:places_review_changelist')
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {'reviewer__id__exact':
+                self.alice.pk})
+        self.assertContains(response, '+food, +value, -decor', count=25)
+        Review.objects.filter(pk__in=list(Review.objects.filter(
+            reviewer=self.alice).values_list('pk', flat=True)[:10])).delete()
+        with self.assertNumQueries(4):
+            self.client.get(url, {'reviewer__id__exact': self.alice.pk})
+
+
+class AdminTests(TestCase):
+
+    def setUp(self):
+        self.place = create_place()
+        for i in range(3):
+            create_review(self.place, User.objects.create_user('user%d' % i),
+                food=True, decor=False, value=True)
+        Scorecard.rebuild([self.place.pk])
+        self.client.force_login(User.objects.create_superuser('admin',
+            password='secret'))
+
+    def get_num_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(captured.captured_queries)
+
+    def test_query_counts_do_not_grow_with_rows(self):
+        review = Review.objects.first()
+        urls = [
+            reverse('admin:places_review_changelist'),
+            reverse('admin:places_review_change', args=(review.pk,)),
+            reverse('admin:places_place_change', args=(self.place.pk,)),
+        ]
+        # The first requests also cache content types
+        before = [self.get_num_queries(url) for url in urls * 2][3:]
+        for i in range(20):
+            create_place('Place %d' % i)
+            create_review(self.place, User.objects.create_user('more%d' % i),
+                food=True, decor=True, value=False)
+        self.assertEqual([self.get_num_queries(url) for url in urls], before)
+
+    def test_foreign_keys_use_autocomplete(self):
+        response = self.client.get(reverse('admin:places_review_change',
+            args=(Review.objects.first().pk,)))
+        self.assertContains(response, 'admin-autocomplete')
+        # Only the selected reviewer is rendered as an option
+        self.assertContains(response, 'user0</option>')
+        self.assertNotContains(response, 'user2</option>')
+
+    def test_review_without_reviewer(self):
+        review = create_review(self.place, None, food=True, decor=True,
+            value=True)
+        response = self.client.get(reverse('admin:places_review_change',
+            args=(review.pk,)))
+        self.assertContains(response, 'by anonymous')
+
+    def test_search(self):
+        create_place('Union Hotel')
+        response = self.client.get(reverse('admin:places_place_changelist'),
+            {'q': 'union'})
+        self.assertEqual([place.name for place in
+            response.context['cl'].result_list], ['Union Hotel'])
+
+    def test_paginator_counts_small_results_exactly(self):
+        paginator = admin.EstimatedCountPaginator(
+            Review.objects.order_by('pk'), 2)
+        self.assertEqual(paginator.count, 3)
+        self.assertEqual(paginator.num_pages, 2)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Needs EXPLAIN estimates')
+    def test_paginator_estimates_large_results(self):
+        paginator = admin.EstimatedCountPaginator(
+            Review.objects.order_by('pk'), 2)
+        with mock.patch.object(paginator, 'ESTIMATE_THRESHOLD', -1):
+            with CaptureQueriesContext(connection) as captured:
+                paginator.count
+        self.assertNotIn('COUNT(', captured.captured_queries[0]['sql'])
+
+
+class AsyncViewTests(TransactionTestCase):
+    # The ORM threads of the async views do not see uncommitted test data
+
+    def setUp(self):
+        django_cache.clear()
+        self.local = create_place('The Local')
+        self.union = create_place('Union Hotel')
+        Scorecard.objects.create(place=self.local, scores={'food': 2})
+        Scorecard.objects.create(place=self.union, scores={'food': 5})
+        call_command('rank_places', stdout=StringIO())
+
+    def sync_and_async(self, url, etag=None):
+        sync = self.client.get(url, HTTP_IF_NONE_MATCH=etag or '')
+
+        async def get():
+            # The async test client takes raw header names
+            return await self.async_client.get(url,
+                **{'if-none-match': etag or ''})
+
+        with override_settings(ROOT_URLCONF='nuereview.async_urls'):
+            response = async_to_sync(get)()
+            self.assertTrue(asyncio.iscoroutinefunction(
+                response.resolver_match.func))
+        return sync, response
+
+    def test_pages_match_sync_views(self):
+        for url in [reverse('places:index'),
+                reverse('places:detail', args=(self.local.pk,)),
+                reverse('places:api_detail', args=(self.local.pk,)),
+                reverse('places:api_scorecard', args=(self.local.pk,))]:
+            sync, response = self.sync_and_async(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, sync.content)
+
+    def test_detail_shows_ranks(self):
+        sync, response = self.sync_and_async(reverse('places:detail',
+            args=(self.local.pk,)))
+        self.assertContains(response, '#2 for food in Newtown')
+
+    def test_place_list(self):
+        sync, response = self.sync_and_async(reverse('places:api_list')
+            + '?limit=1')
+        content = b''.join(sync.streaming_content)
+        self.assertEqual(b''.join(response.streaming_content), content)
+        self.assertEqual(json.loads(content)['next'], 1)
+        sync, response = self.sync_and_async(reverse('places:api_list'),
+            etag=sync['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_place(self):
+        sync, response = self.sync_and_async(reverse('places:detail',
+            args=(0,)))
+        self.assertEqual(response.status_code, 404)
+
+    @skipIf(connection.vendor == 'sqlite',
+        'SQLite test databases are in memory and never closed')
+    def test_orm_threads_keep_their_connections(self):
+        url = reverse('places:detail', args=(self.local.pk,))
+        opened = []
+
+        def count(connection, **kwargs):
+            opened.append(connection)
+
+        connection_created.connect(count)
+        self.addCleanup(connection_created.disconnect, count)
+        with mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=60):
+            for i in range(10):
+                django_cache.clear()
+                self.sync_and_async(url)
+        # At most one per thread, rather than one per query
+        self.assertLessEqual(len(opened),
+            1 + async_views.EXECUTOR._max_workers)
+
+    def test_throughput_benchmark(self):
+        result = benchmarks.throughput([self.local.pk, self.union.pk],
+            concurrency=4, requests=20)
+        self.assertEqual(result['requests'], 20)
+        self.assertGreater(result['wsgi_per_second'], 0)
+        self.assertGreater(result['asgi_per_second'], 0)
+
+
+@override_settings(SCORECARD_QUEUE=True,
+    REVIEW_RATE_LIMITS={'user': (2, 1), 'place': (3, 1)})
+class ThrottleTests(TestCase):
+
+    def setUp(self):
+        django_cache.clear()
+        self.place = create_place()
+        self.alice = User.objects.create_user('alice')
+        self.client.force_login(self.alice)
+        self.url = reverse('places:postreview', args=(self.place.pk,))
+
+    def post(self, key='', **ratings):
+        ratings = ratings or {'food': 'good', 'decor': 'good', 'value': 'poor'}
+        return self.client.post(self.url, dict(ratings, idempotency_key=key))
+
+    def test_resubmissions_are_written_once(self):
+        self.assertEqual(self.post('a').status_code, 302)
+        self.assertEqual(self.post('a').status_code, 302)
+        self.assertEqual(Review.objects.count(), 1)
+        # Without a key, identical ratings count as a resubmission
+        self.post()
+        self.post()
+        self.assertEqual(Review.objects.count(), 2)
+
+    def test_invalid_submission_can_be_fixed(self):
+        self.post('a', food='good')
+        self.assertEqual(self.post('a').status_code, 302)
+        self.assertEqual(Review.objects.count(), 1)
+
+    def test_user_bucket(self):
+        self.post('a')
+        self.post('b')
+        # Only the session and user are read
+        with self.assertNumQueries(2):
+            response = self.post('c')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(Review.objects.count(), 2)
+        with mock.patch('time.time', return_value=time.time() + 60):
+            self.assertEqual(self.post('c').status_code, 302)
+        self.assertEqual(Review.objects.count(), 3)
+
+    def test_invalid_submissions_take_no_tokens(self):
+        for key in 'abc':
+            self.assertEqual(self.post(key, food='good').status_code, 200)
+        self.assertEqual(self.post('d').status_code, 302)
+        self.assertEqual(self.post('e').status_code, 302)
+
+    def test_place_bucket(self):
+        for i in range(3):
+            self.client.force_login(User.objects.create_user('user%d' % i))
+            self.assertEqual(self.post().status_code, 302)
+        self.client.force_login(self.alice)
+        self.assertEqual(self.post().status_code, 429)
+        self.assertEqual(Review.objects.count(), 3)
+        # The place turned the review away, the user keeps their tokens
+        other = create_place(name='The Other')
+        self.url = reverse('places:postreview', args=(other.pk,))
+        self.assertEqual(self.post('a').status_code, 302)
+        self.assertEqual(self.post('b').status_code, 302)
+
+
+class SnapshotTests(TestCase):
+
+    def setUp(self):
+        django_cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings = override_settings(SNAPSHOT_ROOT=self.directory.name,
+            SNAPSHOT_PLACES=1)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.top = create_place(name='The Local')
+        self.other = create_place(name='Union Hotel')
+        Scorecard.objects.create(place=self.top, scores={'food': 3})
+        call_command('rank_places', stdout=StringIO())
+        snapshots.process()
+        self.url = reverse('places:detail', args=(self.top.pk,))
+
+    def get(self, url, *args):
+        response = self.client.get(url, *args)
+        if response.streaming:
+            return response, b''.join(response.streaming_content).decode()
+        return response, response.content.decode()
+
+    def test_anonymous_visitors_get_snapshots(self):
+        self.assertFalse(SnapshotTask.objects.exists())
+        self.assertEqual(snapshots.snapshotted_places(), {self.top.pk})
+        with self.assertNumQueries(0):
+            response, content = self.get(self.url)
+            self.assertIn('The Local', content)
+            self.assertIn('+3', content)
+            response, content = self.get(reverse('places:index'))
+            self.assertIn('Union Hotel', content)
+        self.assertEqual(response['Vary'], 'Cookie')
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+
+    def test_live_pages(self):
+        # Unpopular places, queries and users are rendered live
+        other = reverse('places:detail', args=(self.other.pk,))
+        self.assertIn('context', self.get(other)[0].__dict__)
+        self.assertIn('context', self.get(
+            reverse('places:index'), {'q': 'union'})[0].__dict__)
+        self.client.force_login(User.objects.create_user('alice'))
+        self.assertIn('Logged in as', self.get(self.url)[1])
+
+    def test_changes_invalidate(self):
+        scorecard = self.top.scorecard
+        scorecard.scores = {'food': 5}
+        scorecard.save()
+        self.assertEqual(snapshots.snapshotted_places(), set())
+        self.assertIn('+5', self.get(self.url)[1])
+        self.assertEqual(snapshots.stats()['depth'], 1)
+        snapshots.process()
+        with self.assertNumQueries(0):
+            self.assertIn('+5', self.get(self.url)[1])
+
+        self.top.refresh_from_db()
+        self.top.name = 'The Regional'
+        with commit_hooks():
+            self.top.save()
+        self.assertEqual(snapshots.stats()['depth'], 2)
+        snapshots.process()
+        with self.assertNumQueries(0):
+            self.assertIn('The Regional', self.get(
+                reverse('places:index'))[1])
+
+    def test_ranking_changes(self):
+        Scorecard.objects.create(place=self.other, scores={'food': 9})
+        call_command('rank_places', stdout=StringIO())
+        snapshots.process()
+        self.assertEqual(snapshots.snapshotted_places(), {self.other.pk})
+        with commit_hooks():
+            self.other.delete()
+        snapshots.process()
+        self.assertEqual(snapshots.snapshotted_places(), set())
@@ -0,0 +1,90 @@
+"""
+Admission control for posting reviews, kept in the cache.
+
+Every reviewer and every place has a token bucket, refilled at a steady
+rate up to a burst capacity set in REVIEW_RATE_LIMITS, and posting a review
+takes a token from both, only when both have one. Rejected requests only
+read the cache. Buckets are
+read and written without locking, so concurrent requests can overdraw a
+bucket by a few tokens, which is fine for shedding floods.
+
+Repeated submissions of a review (double clicks, client retries) carry the
+same idempotency key, and only the first one within
+REVIEW_IDEMPOTENCY_WINDOW seconds is written. Workers only share buckets
+and keys through a shared cache backend.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Burst capacity and tokens added per minute
+RATE_LIMITS = {
+    'user': (5, 1),
+    'place': (60, 60),
+}
+
+IDEMPOTENCY_WINDOW = 60 * 10
+
+
+def rate_limit(scope):
+    return getattr(settings, 'REVIEW_RATE_LIMITS', RATE_LIMITS)[scope]
+
+
+def tokens(key, capacity, per_minute, now):
+    """
+    Returns the tokens in the bucket at key at time now
+    """
+    tokens, updated = cache.get(key, (capacity, now))
+    return min(capacity, tokens + (now - updated) * per_minute / 60)
+
+
+def admit(user_id, place_id):
+    """
+    Takes a token from the user's and the place's buckets if both have one,
+    returns 0 or the seconds to wait before retrying
+    """
+    now = time.time()
+    buckets = []
+    for key, scope in (('places:throttle:user:%d' % user_id, 'user'),
+            ('places:throttle:place:%d' % place_id, 'place')):
+        capacity, per_minute = rate_limit(scope)
+        buckets.append((key, capacity, per_minute / 60,
+            tokens(key, capacity, per_minute, now)))
+    wait = max((1 - level) / rate for key, capacity, rate, level in buckets)
+    if wait > 0:
+        return wait
+    for key, capacity, rate, level in buckets:
+        # Expires once full again, a missing bucket is a full one
+        cache.set(key, (level - 1, now), int(capacity / rate) + 1)
+    return 0
+
+
+def idempotency_key(request, place_id, values):
+    """
+    Returns the cache key of a review submission, from the form's or the
+    Idempotency-Key header's key, or else from what it rates
+    """
+    key = (request.POST.get('idempotency_key')
+        or request.META.get('HTTP_IDEMPOTENCY_KEY'))
+    if not key:
+        key = '%d:%s' % (place_id, sorted(values.items()))
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return 'places:review:%d:%s' % (request.user.pk, digest)
+
+
+def seen(key):
+    return cache.get(key) is not None
+
+
+def claim(key):
+    """
+    Marks a submission as written, returns False if it already was
+    """
+    return cache.add(key, True, getattr(settings,
+        'REVIEW_IDEMPOTENCY_WINDOW', IDEMPOTENCY_WINDOW))
+
+
+def release(key):
+    cache.delete(key)
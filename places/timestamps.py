@@ -0,0 +1,23 @@
+"""
+Datetimes as whole microseconds since the Unix epoch, as review cursors and
+analytics exports carry them.
+"""
+import datetime
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def micros(value):
+    """
+    Returns the microseconds since the epoch of an aware datetime
+    """
+    return (value - EPOCH) // MICROSECOND
+
+
+def from_micros(value):
+    """
+    Returns the aware datetime of microseconds since the epoch, raises
+    OverflowError past the range of datetime
+    """
+    return EPOCH + value * MICROSECOND
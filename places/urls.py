@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'places'
 urlpatterns = [
@@ -12,4 +12,22 @@ urlpatterns = [
     path('<int:pk>/review/', views.ReviewView.as_view(), name='review'),
     # ex: /places/1/# REVIEW: /
     path('<int:place_id>/postreview/', views.postreview, name='postreview'),
+    # ex: /places/reviews/?after=1611400000000000-42
+    path('reviews/', views.ReviewHistoryView.as_view(), name='review_history'),
+    # ex: /places/api/places/?after=20&state=NSW
+    path('api/places/', api.place_list, name='api_list'),
+    # ex: /places/api/places/nearby/?lat=-33.89&lon=151.18&radius=2
+    path('api/places/nearby/', api.nearby, name='api_nearby'),
+    # ex: /places/api/places/1/
+    path('api/places/<int:pk>/', api.place_detail, name='api_detail'),
+    # ex: /places/api/places/1/scorecard/
+    path('api/places/<int:pk>/scorecard/', api.place_scorecard,
+        name='api_scorecard'),
+    # ex: /places/api/places/1/trends/?days=30,90&period=week&count=12
+    path('api/places/<int:pk>/trends/', api.place_trends, name='api_trends'),
+    # ex: /places/api/analytics/?group=suburb,month&state=NSW&from=2021-01
+    path('api/analytics/', api.analytics, name='api_analytics'),
+    # ex: /places/api/leaderboards/food/?suburb=Newtown
+    path('api/leaderboards/<str:attribute>/', api.leaderboard,
+        name='api_leaderboard'),
 ]
@@ -1,13 +1,22 @@
+import math
+import uuid
+
+from django.conf import settings
 from django.shortcuts import render
 from django.views import generic
 from django.contrib.auth.models import User
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
+from django.db.models import Q
 
 
+from . import (cache, listing, queue, rollups, search, throttle,
+    timestamps)
 from .models import Place, Review, Feedback, Scorecard
 
 
@@ -15,45 +24,166 @@ class IndexView(generic.ListView):
     template_name = 'places/index.html'
     context_object_name = 'top_places_list'
 
+    page_size = 20
+
     def get_queryset(self):
         """
-        Returns a subset of places in the database
+        Returns a page of places by rank, then the places not ranked yet by
+        id, starting after the rank, or 'u' and the id, given by the 'after'
+        cursor rather than at an offset. With a search query, returns the
+        best matches instead
         """
-        return Place.objects.all()
+        self.next_cursor = None
+        self.query = self.request.GET.get('q', '')
+        self.state = self.request.GET.get('state', '')
+        if self.state not in search.STATES:
+            self.state = ''
+        if self.query.strip():
+            return search.search_places(self.query, self.state)
+
+        places = listing.by_rank(Place.objects.all())
+        if self.state:
+            places = places.filter(state=self.state)
+        places = listing.after(places, self.request.GET.get('after', ''))
+        page = list(places[:self.page_size + 1])
+        if len(page) > self.page_size:
+            page = page[:self.page_size]
+            self.next_cursor = listing.cursor(page[-1].rank, page[-1].pk)
+        return page
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        context['query'] = self.query
+        context['state'] = self.state
+        context['states'] = search.STATES
+        return context
 
 class DetailView(generic.DetailView):
     model = Place
     template_name = 'places/detail.html'
 
+    def get_object(self, queryset=None):
+        place, self.place_version = cache.cached_place(self.kwargs['pk'])
+        return place
 
-class ReviewView(generic.DetailView):
-    model = Place
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # The fragments are cached under the version the place was read at
+        context['place_version'] = self.place_version
+        context['cache_timeout'] = cache.TIMEOUT
+        context['ranks'] = cache.cached_ranks(self.object)
+        context['similar_places'] = cache.cached_similar(self.object.pk)
+        return context
+
+
+class ReviewView(DetailView):
     template_name = 'places/review.html'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Posted back with the form so resubmissions are written once
+        context['idempotency_key'] = uuid.uuid4().hex
+        return context
+
+
+def review_cursor(review):
+    return '%d-%d' % (timestamps.micros(review.visit_date), review.pk)
+
+
+def parse_review_cursor(cursor):
+    """
+    Returns the (visit_date, pk) of a review cursor, or None if invalid
+    """
+    micros, _, pk = cursor.partition('-')
+    if not micros.isdigit() or not pk.isdigit():
+        return None
+    try:
+        visit_date = timestamps.from_micros(int(micros))
+    except OverflowError:
+        return None
+    return visit_date, int(pk)
+
+
+class ReviewHistoryView(LoginRequiredMixin, generic.ListView):
+    template_name = 'places/review_history.html'
+    context_object_name = 'review_list'
+
+    page_size = 20
+
+    def get_queryset(self):
+        """
+        Returns a page of the user's reviews, latest first, with their places
+        and feedback joined in. Pages continue after the (visit_date, pk) of
+        the 'after' cursor so they cost the same however far back they are
+        """
+        self.next_cursor = None
+        reviews = Review.objects.filter(reviewer=self.request.user
+            ).select_related('place', 'reviewer', 'feedback'
+            ).order_by('-visit_date', '-pk')
+        after = parse_review_cursor(self.request.GET.get('after', ''))
+        if after:
+            visit_date, pk = after
+            reviews = reviews.filter(Q(visit_date__lt=visit_date)
+                | Q(visit_date=visit_date, pk__lt=pk))
+        page = list(reviews[:self.page_size + 1])
+        if len(page) > self.page_size:
+            page = page[:self.page_size]
+            self.next_cursor = review_cursor(page[-1])
+        return page
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        return context
+
 @login_required
 def postreview(request, place_id):
-    place = get_object_or_404(Place, pk=place_id)
-    review = Review(visit_date=timezone.now(), place=place, reviewer=request.user)
-
-    feedback = Feedback(review=review)
-    for field in feedback.get_field_names():
+    values = {}
+    for field in Feedback.get_field_names():
         if request.POST.get(field) == 'good':
-            setattr(feedback, field, True)
+            values[field] = True
         elif request.POST.get(field) == 'poor':
-            setattr(feedback, field, False)
+            values[field] = False
 
-    if feedback.get_counts()[0] + feedback.get_counts()[1] < 3:
+    feedback = Feedback(**values)
+    # Invalid forms are sent back before they take a rate token
+    if sum(feedback.get_counts()) < Feedback.MIN_POINTS:
         return render(request, 'places/review.html', {
-            'place':place,
-            'error_message': 'Minimum 3 feedback points required'
+            'place': get_object_or_404(Place, pk=place_id),
+            'idempotency_key': uuid.uuid4().hex,
+            'error_message': 'Minimum %d feedback points required' % Feedback.MIN_POINTS
         })
-    else:
-        review.save()
-        feedback.save()
-        if Scorecard.objects.filter(place=place).count() != 1:
-            sc = Scorecard()
-            place.scorecard = sc
-        place.scorecard.count_scores()
-        place.scorecard.save()
-        #place.scorecard.update_record_with_newest_review(request.user)
+
+    # Duplicates and floods are turned away before touching the database
+    key = throttle.idempotency_key(request, place_id, values)
+    if throttle.seen(key):
+        return HttpResponseRedirect(reverse('places:detail', args=(place_id,)))
+    wait = throttle.admit(request.user.pk, place_id)
+    if wait:
+        response = HttpResponse('Too many reviews, try again later',
+            content_type='text/plain', status=429)
+        response['Retry-After'] = math.ceil(wait)
+        return response
+
+    place = get_object_or_404(Place, pk=place_id)
+    review = Review(visit_date=timezone.now(), place=place, reviewer=request.user)
+    feedback.review = review
+
+    if not throttle.claim(key):
+        # A concurrent duplicate got here first
         return HttpResponseRedirect(reverse('places:detail', args=(place.id,)))
+    try:
+        # The rollups are committed with the review, or neither is
+        with transaction.atomic():
+            if getattr(settings, 'SCORECARD_QUEUE', False):
+                review.save()
+                feedback.save()
+                queue.enqueue(place.id)
+            else:
+                Scorecard.add_review(review, feedback)
+            rollups.record(review, feedback)
+    except Exception:
+        throttle.release(key)
+        raise
+    return HttpResponseRedirect(reverse('places:detail', args=(place.id,)))